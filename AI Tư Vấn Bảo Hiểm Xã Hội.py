@@ -3,39 +3,31 @@ import sys
 import os
 import uuid
 from PIL import Image
-import base64
 import requests
 
+import threading
+
 import streamlit as st
 import uuid
 
 # import streamlit as st
 # import base64
-from pathlib import Path
-
-#Gioi thieu
-@st.cache_data
-def get_base64_of_bin_file(bin_file: str) -> str:
-		with open(bin_file, 'rb') as f:
-				data = f.read()
-		return base64.b64encode(data).decode()
 
+from libs.assets import get_static_image_url
 
 # --- Page config must be first ---
 st.set_page_config(page_title="AI TƯ VẤN BẢO HIỂM XÃ HỘI VIỆT NAM", page_icon=":robot_face:")
 
-# Load images
-BG_PATH = Path(r"D:\UIT\AI\LegiSearch\Source\LawAI.jpg")
-LOGO_PATH = Path(r"D:\UIT\AI\LegiSearch\Source\BHXHlogo.jpeg")
-bg_b64 = get_base64_of_bin_file(BG_PATH)
-logo_b64 = get_base64_of_bin_file(LOGO_PATH)
+# Load images (display-size WebP served from static/, see libs/assets.py)
+bg_url = get_static_image_url("LawAI.jpg", 1920)
+logo_url = get_static_image_url("BHXHlogo.jpeg", 120)
 
 # Custom CSS for background and layout
 st.markdown(f"""
 <style>
     /* Background image - blurred and centered */
     .stMain {{
-        background-image: url("data:image/jpg;base64,{bg_b64}");
+        background-image: url("{bg_url}");
         background-size: cover;
         background-position: center center;
         background-repeat: no-repeat;
@@ -85,7 +77,7 @@ st.markdown(f"""
 
 <div class="header-container">
     <div class="header-text">Chào mừng đến với AI Tư vấn Bảo Hiểm Xã Hội Việt Nam!</div>
-    <img src="data:image/jpeg;base64,{logo_b64}" class="header-logo" />
+    <img src="{logo_url}" class="header-logo" />
 </div>
 """, unsafe_allow_html=True)
 
@@ -96,42 +88,115 @@ if "session_id" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-@st.cache_resource
-def get_rag_system():
+# Bounded memory of this conversation, used to rewrite follow-up questions for retrieval
+if "memory" not in st.session_state:
+    from libs.memory import ConversationMemory
+    st.session_state.memory = ConversationMemory()
+
+def create_rag_system():
+    # Use the shared RAG service when configured, so this worker stays a thin client
+    service_url = os.getenv("RAG_SERVICE_URL")
+    if service_url:
+        from libs.client import RAGServiceClient
+        return RAGServiceClient(service_url)
+    from libs.search import LegalRAGSystem
     return LegalRAGSystem()
 
-if "rag_system" not in st.session_state:
-    with st.spinner("Hệ thống đang khởi động. Vui lòng chờ trong giây lát... "):
-        from libs.search import LegalRAGSystem
-        st.session_state.rag_system = get_rag_system()
+@st.cache_resource
+def start_rag_system():
+    """
+    Start the RAG system once per server process, in a background thread:
+    model load + warm encode, MongoDB ping and LLM client creation.
+    The UI waits on state["ready"] instead of blocking the first query.
+    """
+    state = {"ready": threading.Event(), "rag_system": None, "error": None}
+
+    def startup():
+        try:
+            rag = create_rag_system()
+            rag.warmup()
+            state["rag_system"] = rag
+        except Exception as e:
+            print(f"Error starting RAG system: {e}")
+            state["error"] = e
+        finally:
+            state["ready"].set()
+
+    threading.Thread(target=startup, name="rag-startup", daemon=True).start()
+    return state
+
+startup_state = start_rag_system()
+rag_system = startup_state["rag_system"]
+# Maximum number of history messages rendered per run; older ones load on demand
+CHAT_MAX_RENDERED_MESSAGES = int(os.getenv("CHAT_MAX_RENDERED_MESSAGES", "20"))
+
+if "rendered_messages" not in st.session_state:
+    st.session_state.rendered_messages = CHAT_MAX_RENDERED_MESSAGES
+
+def show_older_messages():
+    st.session_state.rendered_messages += CHAT_MAX_RENDERED_MESSAGES
 
-rag_system = st.session_state.rag_system
 chat_container = None
-# --- Show chat history in scrollable container ---
+intro = st.empty()
+# --- Show chat history in scrollable container (only the most recent messages) ---
 if not st.session_state.chat_history or len(st.session_state.chat_history) == 0:
-    st.warning("Chào bạn! Tôi là trợ lý AI chuyên tư vấn về Bảo hiểm xã hội Việt Nam. Hãy đặt câu hỏi của bạn về các quy định, quyền lợi, thủ tục liên quan đến bảo hiểm xã hội, và tôi sẽ cố gắng giúp bạn!")
+    intro.warning("Chào bạn! Tôi là trợ lý AI chuyên tư vấn về Bảo hiểm xã hội Việt Nam. Hãy đặt câu hỏi của bạn về các quy định, quyền lợi, thủ tục liên quan đến bảo hiểm xã hội, và tôi sẽ cố gắng giúp bạn!")
 else:
     chat_container = st.container(height=400)
     with chat_container:
-        for message in st.session_state.chat_history:
+        history = st.session_state.chat_history
+        hidden = max(0, len(history) - st.session_state.rendered_messages)
+        if hidden:
+            st.button(
+                f"Xem thêm tin nhắn cũ ({hidden} tin nhắn đang ẩn)",
+                on_click=show_older_messages,
+                use_container_width=True
+            )
+        for message in history[hidden:]:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
 # --- Input ---
+if not startup_state["ready"].is_set():
+    # Keep the input disabled until the background startup finishes
+    st.chat_input("Hệ thống đang khởi động. Vui lòng chờ trong giây lát...", disabled=True)
+    with st.spinner("Hệ thống đang khởi động. Vui lòng chờ trong giây lát... "):
+        startup_state["ready"].wait()
+    st.rerun()
+
+if startup_state["error"] is not None:
+    st.error("Không thể khởi động hệ thống. Vui lòng thử lại sau.")
+    if st.button("Thử lại"):
+        start_rag_system.clear()
+        st.rerun()
+    st.stop()
+
 prompt = st.chat_input("Vui lòng nhập câu hỏi của bạn về bảo hiểm xã hội.")
 
+def stream_answer_tokens(events):
+    """Yield only the answer text from generate_answer_stream events."""
+    for event in events:
+        if event["type"] == "token":
+            yield event["content"]
+
+def render_streamed_answer(prompt):
+    with st.chat_message("user"):
+        st.markdown(prompt)
+    with st.chat_message("AI"):
+        events = rag_system.generate_answer_stream(prompt, mode="hybrid", memory=st.session_state.memory)
+        return st.write_stream(stream_answer_tokens(events))
+
 if prompt:
     # Add user's message to history
     st.session_state.chat_history.append({"role": "user", "content": prompt})
     
-    # Generate AI response
+    # Generate AI response, rendering tokens as the model produces them
+    intro.empty()
     if chat_container is not None:
         with chat_container:
-            with st.spinner("Hệ thống đang truy xuất dữ liệu. Vui lòng chờ trong giây lát... "):
-                response = rag_system.generate_answer(prompt, mode="hybrid")
+            api_response = render_streamed_answer(prompt)
     else:
-        with st.spinner("Hệ thống đang truy xuất dữ liệu. Vui lòng chờ trong giây lát... "):
-            response = rag_system.generate_answer(prompt, mode="hybrid")
+        api_response = render_streamed_answer(prompt)
         
     # create fake response
     # response = {
@@ -141,11 +206,10 @@ if prompt:
     #         {"title": "Nghị định 115/2015/NĐ-CP", "url": "https://thuvienphapluat.vn/van-ban/lao-dong-ve-lao-dong/nghi-dinh-115-2015-nd-cp-quy-dinh-ve-bao-hiem-xa-hoi-bao-hiem-y-te-bao-hiem-thue-301828.aspx"}
     #     ]
     # }
-    if response is not None:
-        api_response = response["answer"]
+    if api_response:
         st.session_state.chat_history.append({"role": "AI", "content": api_response})
     else:
         st.session_state.chat_history.append({"role": "AI", "content": "Error: backend returned no response"})
     
-    # Rerun to show the new messages in the container
-    st.rerun()
\ No newline at end of file
+    # No rerun: the new turn is already on screen, and the next run
+    # renders it from history together with the other recent messages
@@ -1,39 +1,67 @@
 # -*- coding: utf-8 -*-
 """
 RAG System for Legal Document Search
+
+Public names are imported lazily on first access, so `import libs` stays fast
+and heavy dependencies (sentence_transformers, torch, langchain) load only
+when a model or LLM is actually used.
 """
+import importlib
 
-from .search import (
-    LegalRAGSystem,
-    SearchMode,
-    create_rag_system,
-    search_legal_documents,
-    ask_legal_question
-)
-
-from .utils import (
-    get_embedding_model,
-    get_embedding,
-    get_mongodb_connection,
-    get_mongodb_collection
-)
-
-__all__ = [
+# Public name -> submodule that defines it
+_EXPORTS = {
     # Main classes
-    "LegalRAGSystem",
-    "SearchMode",
+    "LegalRAGSystem": ".search",
+    "SearchMode": ".search",
+    "VectorBackend": ".search",
+    "KeywordBackend": ".search",
+    "LocalVectorIndex": ".vector_index",
+    "BM25Index": ".bm25",
+    "FusionStrategy": ".fusion",
+    "RAGServiceClient": ".client",
+    "ConversationMemory": ".memory",
+    "CrossEncoderReranker": ".rerank",
     
     # Convenience functions
-    "create_rag_system",
-    "search_legal_documents",
-    "ask_legal_question",
+    "create_rag_system": ".search",
+    "get_shared_rag_system": ".search",
+    "invalidate_rag_systems": ".search",
+    "fuse_results": ".fusion",
+    "search_legal_documents": ".search",
+    "ask_legal_question": ".search",
     
     # Utility functions
-    "get_embedding_model",
-    "get_embedding",
-    "get_mongodb_connection",
-    "get_mongodb_collection",
-]
+    "get_embedding_model": ".utils",
+    "get_embedding": ".utils",
+    "get_embeddings": ".utils",
+    "get_embedding_cache_stats": ".utils",
+    "enable_embedding_batcher": ".utils",
+    "disable_embedding_batcher": ".utils",
+    "clear_embedding_cache": ".utils",
+    "warmup": ".utils",
+    "count_tokens": ".utils",
+    "chunk_documents": ".chunking",
+    "expand_to_parents": ".chunking",
+    "pack_context": ".context",
+    "get_mongodb_connection": ".utils",
+    "get_mongodb_collection": ".utils",
+    "close_mongodb_connections": ".utils",
+}
+
+__all__ = list(_EXPORTS)
 
 __version__ = "1.0.0"
 
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Image assets for the Streamlit pages
+Downscales images from Source/ once to WebP in static/, which Streamlit serves
+at app/static/... (server.enableStaticServing in .streamlit/config.toml), so
+pages reference a short URL instead of inlining base64 images on every run.
+"""
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+# Original images (tracked in git)
+SOURCE_DIR = Path(__file__).parent.parent / "Source"
+
+# Generated images, served by Streamlit static file serving
+STATIC_DIR = Path(__file__).parent.parent / "static"
+STATIC_URL = "app/static"
+
+WEBP_QUALITY = 80
+
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_static_image_url(name: str, max_width: int) -> str:
+    """
+    Get the static URL of a display-size WebP version of an image in Source/.
+
+    The WebP file is (re)generated only when missing or older than the
+    original, so this is cheap after the first call.
+
+    Args:
+        name: File name in Source/ (e.g. "LawAI.jpg")
+        max_width: Display width in pixels; larger images are downscaled
+
+    Returns:
+        URL relative to the app (e.g. "app/static/LawAI.1920.webp")
+
+    Raises:
+        FileNotFoundError: If the image does not exist in Source/
+    """
+    source_path = SOURCE_DIR / name
+    if not source_path.exists():
+        raise FileNotFoundError(f"Image not found: {source_path}")
+
+    output_name = f"{source_path.stem}.{max_width}.webp"
+    output_path = STATIC_DIR / output_name
+
+    with _lock:
+        if not output_path.exists() or output_path.stat().st_mtime < source_path.stat().st_mtime:
+            _write_webp(source_path, output_path, max_width)
+
+    return f"{STATIC_URL}/{output_name}"
+
+
+def _write_webp(source_path: Path, output_path: Path, max_width: int):
+    from PIL import Image
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source_path) as image:
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        # Write to a temporary file first so concurrent readers never see a partial image
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=6)
+    tmp_path.replace(output_path)
+    print(f"Wrote {output_path} ({output_path.stat().st_size // 1024} KB)")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+In-process BM25 keyword index
+Vietnamese-aware tokenization (NFC, optional diacritic folding, syllable
+bigrams) and an inverted index with postings stored in NumPy arrays
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Iterable
+
+import numpy as np
+
+from .utils import make_chunk_id
+from .chunking import CHUNK_FIELDS, SEARCHABLE_FILTER
+
+# Fields indexed for keyword search, and returned with every hit
+TEXT_FIELDS = ("tieu_de", "loai_heading", "noi_dung")
+METADATA_FIELDS = ("van_ban", "tieu_de", "loai_heading", "noi_dung")
+
+# MongoDB array field holding each document's unique terms (multikey index)
+TOKENS_FIELD = "tokens"
+
+# Words (syllables) and single punctuation marks; punctuation ends a bigram chain
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# BM25 parameters (Robertson et al.)
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+
+def fold_diacritics(text: str) -> str:
+    """
+    Remove Vietnamese diacritics, e.g. "bảo hiểm" -> "bao hiem".
+    """
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return text.replace("đ", "d").replace("Đ", "D")
+
+
+def tokenize(text: str, fold: bool = False, bigrams: bool = True) -> List[str]:
+    """
+    Split text into index terms.
+
+    Vietnamese words are written as space-separated syllables, so besides the
+    syllables themselves, adjacent syllable pairs are emitted as bigram terms
+    ("bảo_hiểm") to match compounds such as "bảo hiểm" or "thất nghiệp".
+
+    Args:
+        text: Input text
+        fold: Remove diacritics, so queries typed without accents still match
+        bigrams: Also emit syllable bigrams
+
+    Returns:
+        List of terms (syllables first, then bigrams)
+    """
+    text = unicodedata.normalize("NFC", text or "").lower()
+    if fold:
+        text = fold_diacritics(text)
+
+    terms = []
+    pairs = []
+    previous = None
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if not (token[0].isalnum() or token[0] == "_"):
+            previous = None
+            continue
+        terms.append(token)
+        if bigrams and previous is not None:
+            pairs.append(f"{previous}_{token}")
+        previous = token
+
+    return terms + pairs
+
+
+def document_terms(doc: Dict) -> List[str]:
+    """
+    Unique index terms of a document, stored in its TOKENS_FIELD.
+
+    Args:
+        doc: Document with tieu_de/loai_heading/noi_dung fields
+
+    Returns:
+        Sorted list of unique terms (syllables and bigrams)
+    """
+    return sorted(set(tokenize(" \n".join(doc.get(field) or "" for field in TEXT_FIELDS))))
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the legal corpus.
+
+    Postings are stored in CSR layout: the postings of term t are
+    `doc_ids[indptr[t]:indptr[t + 1]]` with matching `term_freqs`, so a
+    query touches only the postings of its own terms.
+    """
+
+    def __init__(
+        self,
+        documents: Iterable[Dict],
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+        fold: bool = False,
+        bigrams: bool = True
+    ):
+        """
+        Build index.
+
+        Args:
+            documents: Documents with van_ban/tieu_de/loai_heading/noi_dung fields
+            k1: Term frequency saturation
+            b: Document length normalization
+            fold: Fold diacritics in documents and queries
+            bigrams: Index syllable bigrams
+        """
+        self.k1 = k1
+        self.b = b
+        self.fold = fold
+        self.bigrams = bigrams
+        self.metadata: List[Dict] = []
+
+        vocabulary: Dict[str, int] = {}
+        term_ids = []
+        doc_ids = []
+        term_freqs = []
+        doc_lengths = []
+
+        for doc in documents:
+            record = {"id": doc.get("id") or make_chunk_id(doc)}
+            record.update({field: doc.get(field, "") for field in METADATA_FIELDS})
+            record.update({field: doc[field] for field in CHUNK_FIELDS if doc.get(field)})
+            doc_id = len(self.metadata)
+            self.metadata.append(record)
+
+            terms = tokenize(" \n".join(doc.get(field) or "" for field in TEXT_FIELDS), fold, bigrams)
+            doc_lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(count)
+
+        if not self.metadata:
+            raise ValueError("No documents found to build the BM25 index.")
+
+        # Group postings by term (stable, so doc ids stay sorted within a term)
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.vocabulary = vocabulary
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.term_freqs = np.asarray(term_freqs, dtype=np.float32)[order]
+        self.indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.indptr[1:])
+
+        doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        num_docs = len(doc_lengths)
+        doc_freqs = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() or 1.0
+        self.length_norm = (k1 * (1.0 - b + b * doc_lengths / avg_length)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "BM25Index":
+        """
+        Build index with a single scan over the searchable documents of a MongoDB collection.
+
+        Args:
+            collection: pymongo collection
+            **kwargs: BM25Index options
+
+        Returns:
+            BM25Index instance
+        """
+        projection = {"_id": 0, "chunk_id": 1}
+        projection.update({field: 1 for field in METADATA_FIELDS + CHUNK_FIELDS})
+        return cls(collection.find(SEARCHABLE_FILTER, projection), **kwargs)
+
+    def search(self, query: str, limit: int) -> List[Dict]:
+        """
+        Find the `limit` documents with the highest BM25 score.
+
+        Args:
+            query: Search query
+            limit: Maximum number of results
+
+        Returns:
+            List of metadata dicts with added `score` and `search_type` fields, best first
+        """
+        term_ids = {
+            self.vocabulary[term]
+            for term in tokenize(query, self.fold, self.bigrams)
+            if term in self.vocabulary
+        }
+        if not term_ids or limit <= 0:
+            return []
+
+        scores = np.zeros(len(self.metadata), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + self.length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(scores[matched], -limit)[-limit:]]
+        top = matched[np.argsort(-scores[matched], kind="stable")]
+
+        results = []
+        for idx in top:
+            result = dict(self.metadata[idx])
+            result["score"] = float(scores[idx])
+            result["search_type"] = "keyword"
+            results.append(result)
+
+        return results
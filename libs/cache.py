@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Caches for the RAG system
+In-memory LRU/TTL cache with an optional SQLite tier that survives restarts
+"""
+import re
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Marker for cache misses, since None can be a cached value
+_MISSING = object()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text without changing its meaning for a cased model.
+
+    Applies Unicode NFC and whitespace collapsing, so "Lương  hưu" and
+    "Lương hưu" become the same string.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Normalized text
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query for use as a cache key.
+
+    Applies normalize_text and lowercasing, so "Lương  hưu" and
+    "lương hưu" share one entry. Only use it where the cached value does
+    not depend on casing (e.g. answers); for model outputs, key on
+    normalize_text and feed the model the same normalized text.
+
+    Args:
+        text: Raw query
+
+    Returns:
+        Normalized query
+    """
+    return normalize_text(text).lower()
+
+
+class SQLiteCache:
+    """
+    Persistent key-value cache stored in a SQLite file.
+
+    Values must be JSON serializable.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        table: str = "cache",
+        ttl: Optional[float] = None
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            path: SQLite database file (created if missing)
+            table: Table name, so several caches can share one file
+            ttl: Entry lifetime in seconds (None: entries never expire)
+        """
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid cache table name: {table}")
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return default
+        value, created_at = row
+        if self.ttl is not None and time.time() - created_at > self.ttl:
+            self.delete(key)
+            return default
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU cache with optional TTL and hit/miss counters.
+
+    With a `backing` store (e.g. SQLiteCache), entries are written through to
+    it and memory misses fall back to it before counting as a miss.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        backing: Optional[SQLiteCache] = None
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            maxsize: Maximum number of in-memory entries
+            ttl: Entry lifetime in seconds (None: entries never expire)
+            backing: Optional persistent tier
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backing = backing
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if self.ttl is None or time.monotonic() - created_at <= self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        if self.backing is not None:
+            value = self.backing.get(key, _MISSING)
+            if value is not _MISSING:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any):
+        self._store(key, value)
+        if self.backing is not None:
+            self.backing.set(key, value)
+
+    def _store(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.backing is not None:
+            self.backing.delete(key)
+
+    def clear(self):
+        """
+        Remove all entries (including the persistent tier) and reset counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.backing is not None:
+            self.backing.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, hit_rate, size and maxsize
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Structure-aware chunking of legal articles
+Splits each article (Điều) into clause (Khoản: "1.", "2.") and point
+(Điểm: "a)", "b)") chunks with parent pointers and character offsets, so
+retrieval runs over small chunks and can expand back to the parent text.
+
+Run: python -m libs.chunking --input data/BHXH_cleaned.json --target-collection VNLawsChunks
+"""
+import os
+import re
+import csv
+import json
+from pathlib import Path
+from collections import Counter
+from typing import List, Dict, Iterable, Callable, Literal, Optional, Union
+
+from pymongo import ReplaceOne
+
+from .utils import get_mongodb_collection, make_chunk_id
+
+# Chunk level type
+ChunkLevel = Literal["dieu", "khoan", "diem"]
+
+# Articles and clauses longer than this are split into smaller chunks
+DEFAULT_MAX_CHARS = 800
+
+# Optional chunk fields carried through search results
+CHUNK_FIELDS = ("parent_id", "article_id", "level")
+
+# MongoDB filter for searchable documents: parents that were split have leaf=False,
+# unchunked corpora have no leaf field
+SEARCHABLE_FILTER = {"leaf": {"$ne": False}}
+
+# Clause "1. ..." and point "a) ..." markers at the start of a line
+_CLAUSE_RE = re.compile(r"^[ \t]*(\d{1,3})\.[ \t]", re.MULTILINE)
+_POINT_RE = re.compile(r"^[ \t]*([a-zđ])\)[ \t]", re.MULTILINE)
+
+# Vietnamese point letters, in order (no f, j, w, z; đ follows d)
+POINT_LETTERS = "abcdđeghiklmnopqrstuvxy"
+
+
+def _clause_starts(text: str) -> List[tuple]:
+    """
+    Find clause markers numbered consecutively (1., 2., 3., ...).
+
+    Numbered lines that break the sequence (e.g. list items inside a clause)
+    are not treated as clause starts.
+    """
+    starts = []
+    for match in _CLAUSE_RE.finditer(text):
+        number = int(match.group(1))
+        if not starts or number == starts[-1][0] + 1:
+            starts.append((number, match.start()))
+    return starts
+
+
+def _point_starts(text: str) -> List[tuple]:
+    """
+    Find point markers in alphabetical order (a), b), c), ...).
+    """
+    starts = []
+    for match in _POINT_RE.finditer(text):
+        index = POINT_LETTERS.find(match.group(1))
+        if index < 0:
+            continue
+        if not starts or index == POINT_LETTERS.find(starts[-1][0]) + 1:
+            starts.append((match.group(1), match.start()))
+    return starts
+
+
+def _make_chunk(
+    article: Dict,
+    article_id: str,
+    chunk_id: str,
+    parent_id: Optional[str],
+    level: ChunkLevel,
+    text: str,
+    start: int,
+    end: int,
+    label: str = "",
+    leaf: bool = True
+) -> Dict:
+    # Offsets point at the stripped text inside the article's noi_dung
+    segment = text[start:end]
+    stripped_start = start + len(segment) - len(segment.lstrip())
+    stripped_end = start + len(segment.rstrip())
+    tieu_de = article.get("tieu_de", "")
+    return {
+        "chunk_id": chunk_id,
+        "parent_id": parent_id,
+        "article_id": article_id,
+        "level": level,
+        "leaf": leaf,
+        "van_ban": article.get("van_ban", ""),
+        "loai_heading": article.get("loai_heading", ""),
+        "tieu_de": f"{tieu_de} - {label}" if label else tieu_de,
+        "noi_dung": text[stripped_start:stripped_end],
+        "start": stripped_start,
+        "end": stripped_end,
+    }
+
+
+def chunk_article(
+    article: Dict,
+    max_chars: int = DEFAULT_MAX_CHARS,
+    article_id: Optional[str] = None
+) -> List[Dict]:
+    """
+    Split one article into clause and point chunks.
+
+    Returns the article itself (level "dieu") followed by its chunks. Records
+    that were split further have `leaf` False; only leaves are embedded and
+    searched, the others are parents for expansion. Articles up to
+    `max_chars` characters, or without clause markers, stay one leaf chunk.
+
+    Args:
+        article: Document with van_ban, loai_heading, tieu_de, noi_dung
+        max_chars: Split articles and clauses longer than this
+        article_id: Chunk id of the article (default: make_chunk_id(article))
+
+    Returns:
+        List of chunk records
+    """
+    text = article.get("noi_dung") or ""
+    article_id = article_id or make_chunk_id(article)
+    clauses = _clause_starts(text) if len(text) > max_chars else []
+
+    root = _make_chunk(article, article_id, article_id, None, "dieu", text, 0, len(text), leaf=not clauses)
+    chunks = [root]
+    if not clauses:
+        return chunks
+
+    # Text before the first clause (e.g. "Người lao động ... bao gồm:")
+    if text[:clauses[0][1]].strip():
+        chunks.append(_make_chunk(article, article_id, f"{article_id}-0", article_id, "khoan", text, 0, clauses[0][1]))
+
+    bounds = [start for _, start in clauses] + [len(text)]
+    for (number, start), end in zip(clauses, bounds[1:]):
+        clause_id = f"{article_id}-k{number}"
+        label = f"Khoản {number}"
+        points = _point_starts(text[start:end]) if end - start > max_chars else []
+        chunks.append(_make_chunk(article, article_id, clause_id, article_id, "khoan", text, start, end, label, leaf=not points))
+        if not points:
+            continue
+
+        # Clause lead-in before the first point, then one chunk per point
+        lead_end = start + points[0][1]
+        if text[start:lead_end].strip():
+            chunks.append(_make_chunk(article, article_id, f"{clause_id}-0", clause_id, "khoan", text, start, lead_end, label))
+        point_bounds = [start + offset for _, offset in points] + [end]
+        for (letter, point_start), point_end in zip(points, point_bounds[1:]):
+            point_start += start
+            chunks.append(_make_chunk(
+                article,
+                article_id,
+                f"{clause_id}{letter}",
+                clause_id,
+                "diem",
+                text,
+                point_start,
+                point_end,
+                f"{label}, điểm {letter}"
+            ))
+
+    return chunks
+
+
+def chunk_documents(documents: Iterable[Dict], max_chars: int = DEFAULT_MAX_CHARS) -> List[Dict]:
+    """
+    Chunk every article of a corpus.
+
+    Args:
+        documents: Article documents
+        max_chars: Split articles and clauses longer than this
+
+    Returns:
+        List of chunk records (parents and leaves)
+    """
+    chunks = []
+    seen = Counter()
+    for article in documents:
+        # Duplicated articles (same title and content) get numbered ids
+        article_id = make_chunk_id(article)
+        seen[article_id] += 1
+        if seen[article_id] > 1:
+            article_id = f"{article_id}~{seen[article_id]}"
+        chunks.extend(chunk_article(article, max_chars, article_id))
+    return chunks
+
+
+def expand_to_parents(
+    results: List[Dict],
+    fetch_parents: Callable[[List[str]], Dict[str, Dict]],
+    min_chars: int = 200
+) -> List[Dict]:
+    """
+    Replace chunk hits with their parent when the chunk alone is too little context.
+
+    A hit is expanded when it is shorter than `min_chars`, or when another hit
+    shares its parent (the parent then replaces all of them, at the position
+    of the best one). Hits without `parent_id` are kept as they are.
+
+    Args:
+        results: Search results, best first
+        fetch_parents: Function mapping parent ids to parent records
+        min_chars: Expand hits shorter than this
+
+    Returns:
+        Results with expanded parents, without duplicates
+    """
+    siblings = Counter(result.get("parent_id") for result in results if result.get("parent_id"))
+    wanted = {
+        result["parent_id"]
+        for result in results
+        if result.get("parent_id")
+        and (siblings[result["parent_id"]] > 1 or len(result.get("noi_dung", "")) < min_chars)
+    }
+    if not wanted:
+        return results
+
+    parents = fetch_parents(sorted(wanted))
+    expanded = []
+    positions = {}
+    for result in results:
+        parent = parents.get(result.get("parent_id")) if result.get("parent_id") in wanted else None
+        if parent is None:
+            key = result.get("chunk_id")
+            if key is None or key not in positions:
+                positions[key] = len(expanded)
+                expanded.append(result)
+            continue
+
+        key = parent["chunk_id"]
+        if key in positions:
+            expanded[positions[key]].setdefault("expanded_from", []).append(result.get("chunk_id"))
+            continue
+
+        merged = dict(result)
+        merged.update({field: parent.get(field) for field in ("chunk_id", "parent_id", "level", "tieu_de", "noi_dung")})
+        merged["expanded_from"] = [result.get("chunk_id")]
+        positions[key] = len(expanded)
+        expanded.append(merged)
+
+    return expanded
+
+
+def load_documents(path: Union[str, Path]) -> List[Dict]:
+    """
+    Load articles from a CSV or JSON file (columns van_ban, loai_heading, tieu_de, noi_dung).
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def save_chunks(chunks: List[Dict], path: Union[str, Path]):
+    """
+    Write chunk records to a JSON file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False, indent=2)
+
+
+def write_chunks(collection, chunks: List[Dict], write_batch_size: int = 500) -> int:
+    """
+    Upsert chunk records into a MongoDB collection by chunk_id.
+
+    Replaced chunks lose their embedding; run libs.create_embeddings afterwards.
+
+    Args:
+        collection: Target collection
+        chunks: Chunk records
+        write_batch_size: Number of upserts per bulk_write call
+
+    Returns:
+        Number of chunks written
+    """
+    collection.create_index("chunk_id", unique=True)
+    collection.create_index("parent_id")
+
+    written = 0
+    for start in range(0, len(chunks), write_batch_size):
+        batch = chunks[start:start + write_batch_size]
+        collection.bulk_write(
+            [ReplaceOne({"chunk_id": chunk["chunk_id"]}, chunk, upsert=True) for chunk in batch],
+            ordered=False
+        )
+        written += len(batch)
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Split legal articles into clause/point chunks")
+    parser.add_argument(
+        "--input",
+        type=str,
+        default=None,
+        help="CSV or JSON file with articles (default: read the MongoDB source collection)"
+    )
+    parser.add_argument(
+        "--db-name",
+        type=str,
+        default=None,
+        help="MongoDB database name (default: from env MONGODB_DB_NAME)"
+    )
+    parser.add_argument(
+        "--collection-name",
+        type=str,
+        default=None,
+        help="Source collection when --input is not given (default: from env MONGODB_COLLECTION_NAME)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write chunks to this JSON file"
+    )
+    parser.add_argument(
+        "--target-collection",
+        type=str,
+        default=None,
+        help="Upsert chunks into this MongoDB collection"
+    )
+    parser.add_argument(
+        "--max-chars",
+        type=int,
+        default=int(os.getenv("CHUNK_MAX_CHARS", str(DEFAULT_MAX_CHARS))),
+        help=f"Split articles and clauses longer than this (default: {DEFAULT_MAX_CHARS})"
+    )
+
+    args = parser.parse_args()
+
+    if not args.output and not args.target_collection:
+        parser.error("Give --output and/or --target-collection")
+
+    if args.input:
+        articles = load_documents(args.input)
+    else:
+        source = get_mongodb_collection(args.db_name, args.collection_name)
+        articles = list(source.find({"leaf": {"$exists": False}}, {"_id": 0, "embedding": 0, "tokens": 0}))
+
+    chunks = chunk_documents(articles, args.max_chars)
+    levels = Counter(chunk["level"] for chunk in chunks if chunk["leaf"])
+    print(
+        f"{len(articles)} articles -> {sum(levels.values())} searchable chunks "
+        f"({', '.join(f'{level}: {count}' for level, count in sorted(levels.items()))})"
+    )
+
+    if args.output:
+        save_chunks(chunks, args.output)
+        print(f"Wrote chunks to {args.output}")
+    if args.target_collection:
+        target = get_mongodb_collection(args.db_name, args.target_collection)
+        print(f"Upserted {write_chunks(target, chunks)} chunks into {args.target_collection}")
+        print("Next: python -m libs.create_embeddings --collection-name " + args.target_collection)
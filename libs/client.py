@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Thin client for the RAG HTTP service (libs/server.py)
+Exposes the same search/answer methods as LegalRAGSystem, so callers can
+switch between in-process and remote retrieval without other changes.
+"""
+import json
+import urllib.request
+from typing import List, Dict, Optional, Iterator
+
+from .search import SearchMode
+from .memory import ConversationMemory
+
+
+class RAGServiceClient:
+    """
+    HTTP client for the RAG service.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        """
+        Initialize client.
+
+        Args:
+            base_url: Service URL, e.g. http://127.0.0.1:8000
+            timeout: Socket timeout in seconds
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json; charset=utf-8"},
+            method="POST"
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def health(self) -> Dict:
+        """
+        Get service health.
+
+        Returns:
+            Health payload from GET /health
+        """
+        with urllib.request.urlopen(self.base_url + "/health", timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def warmup(self):
+        """
+        Check that the service is reachable (the service keeps its own model warm).
+        """
+        self.health()
+
+    def search(
+        self,
+        query: str,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Perform search on the service.
+
+        Args:
+            query: Search query
+            mode: Search mode - "keyword", "semantic", or "hybrid"
+            limit: Maximum number of results
+
+        Returns:
+            List of search results
+        """
+        with self._post("/search", {"query": query, "mode": mode, "limit": limit}) as response:
+            return json.loads(response.read().decode("utf-8"))["results"]
+
+    def generate_answer_stream(
+        self,
+        query: str,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> Iterator[Dict]:
+        """
+        Stream answer events from the service.
+
+        Yields the same events as LegalRAGSystem.generate_answer_stream:
+        "sources", then "token" chunks, then "done".
+
+        Args:
+            query: User question
+            mode: Search mode
+            limit: Number of results to retrieve
+            memory: Conversation memory; sent with the request and updated
+                from the service's reply
+
+        Yields:
+            Event dictionaries
+        """
+        payload = {"query": query, "mode": mode, "limit": limit}
+        if memory is not None:
+            payload["memory"] = memory.to_dict()
+
+        with self._post("/answer", payload) as response:
+            data_lines = []
+            for raw_line in response:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].lstrip())
+                elif not line and data_lines:
+                    # A blank line ends one event
+                    event = json.loads("\n".join(data_lines))
+                    data_lines = []
+                    if event["type"] == "memory":
+                        if memory is not None:
+                            memory.update(event["memory"])
+                        continue
+                    yield event
+
+    def generate_answer(
+        self,
+        query: str,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> Dict:
+        """
+        Get a complete answer from the service.
+
+        Args:
+            query: User question
+            mode: Search mode
+            limit: Number of results to retrieve
+            memory: Conversation memory (see generate_answer_stream)
+
+        Returns:
+            Dictionary with answer and sources
+        """
+        result = {"answer": "", "sources": [], "query": query, "search_mode": mode}
+        for event in self.generate_answer_stream(query, mode=mode, limit=limit, memory=memory):
+            if event["type"] == "sources":
+                result["sources"] = event["sources"]
+                result["standalone_query"] = event.get("standalone_query", query)
+            elif event["type"] == "done":
+                result["answer"] = event["answer"]
+        return result
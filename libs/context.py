@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Token-budgeted context packing
+Selects and trims search results so the LLM context fits a token budget:
+sources are taken greedily by score (or by maximal marginal relevance), cut at
+sentence/clause boundaries, and text already included from another source
+(e.g. a clause and its parent article) is not repeated.
+"""
+import re
+from typing import List, Dict, Literal
+
+from .bm25 import tokenize
+from .utils import count_tokens
+
+# Packing strategy type
+PackStrategy = Literal["score", "mmr"]
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+# Relevance/diversity trade-off of the "mmr" strategy (1.0 = score order)
+DEFAULT_MMR_LAMBDA = 0.7
+
+# Sources that cannot get at least this many content tokens are skipped
+MIN_SOURCE_TOKENS = 30
+
+TRUNCATION_MARK = " ..."
+
+# Shorter units (e.g. "Trong đó:") are not deduplicated across sources
+MIN_DEDUP_CHARS = 20
+
+# Sentence ends, clause ends (";", ":") and line breaks; not the dot of clause numbers ("2.")
+_UNIT_RE = re.compile(r"(?<=[.!?;:])(?<!\d\.)\s+|\s*\n\s*")
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def split_units(text: str) -> List[str]:
+    """
+    Split text into sentences, clauses and lines, the units context is trimmed at.
+
+    Each unit keeps its trailing whitespace, so joining units restores the text.
+    """
+    text = text or ""
+    units = []
+    start = 0
+    for match in _UNIT_RE.finditer(text):
+        units.append(text[start:match.end()])
+        start = match.end()
+    units.append(text[start:])
+    return [unit for unit in units if unit.strip()]
+
+
+def format_header(index: int, result: Dict) -> str:
+    """
+    Header of one source in the context block.
+    """
+    return f"[{index}] {result.get('tieu_de', '')}\nVăn bản: {result.get('van_ban', '')}\nNội dung: "
+
+
+def format_context(packed: List[Dict]) -> str:
+    """
+    Format packed sources (output of pack_context) into the context block of the prompt.
+    """
+    return "\n\n".join(
+        format_header(i, result) + result["context_text"]
+        for i, result in enumerate(packed, 1)
+    )
+
+
+def _cut_unit(unit: str, max_tokens: int) -> str:
+    # Cut a single over-long unit at a word boundary so it fits max_tokens
+    text = unit
+    while text and count_tokens(text + TRUNCATION_MARK) > max_tokens:
+        cut = int(len(text) * max_tokens / count_tokens(text + TRUNCATION_MARK) * 0.9)
+        text = text[:cut].rsplit(" ", 1)[0] if " " in text[:cut] else text[:cut]
+    return text + TRUNCATION_MARK if text else ""
+
+
+def _order_by_mmr(results: List[Dict], mmr_lambda: float) -> List[Dict]:
+    # Lexical similarity (syllable/bigram sets) stands in for embeddings, which
+    # search results do not carry
+    term_sets = [set(tokenize(result.get("noi_dung", ""))) for result in results]
+    scores = [float(result.get("score") or 0.0) for result in results]
+    low, high = min(scores), max(scores)
+    relevance = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+
+    selected = []
+    remaining = list(range(len(results)))
+    while remaining:
+        def marginal(i):
+            redundancy = max(
+                (len(term_sets[i] & term_sets[j]) / (len(term_sets[i] | term_sets[j]) or 1) for j in selected),
+                default=0.0
+            )
+            return mmr_lambda * relevance[i] - (1.0 - mmr_lambda) * redundancy
+
+        best = max(remaining, key=marginal)
+        selected.append(best)
+        remaining.remove(best)
+
+    return [results[i] for i in selected]
+
+
+def pack_context(
+    results: List[Dict],
+    token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    strategy: PackStrategy = "score",
+    mmr_lambda: float = DEFAULT_MMR_LAMBDA
+) -> List[Dict]:
+    """
+    Select and trim search results to fit a token budget.
+
+    Sources are filled greedily, each taking whole sentences/clauses until the
+    budget is used up; sentences already included from an earlier source are
+    dropped, and sources with no new text are skipped.
+
+    Args:
+        results: Search results with tieu_de/van_ban/noi_dung and score
+        token_budget: Maximum tokens of the formatted context block
+        strategy: "score" (highest score first) or "mmr" (maximal marginal
+            relevance, trading score against overlap with earlier sources)
+        mmr_lambda: Relevance weight of the "mmr" strategy
+
+    Returns:
+        Packed sources in context order: copies of the results with added
+        `context_text` (text sent to the LLM), `context_tokens` (tokens used,
+        header included) and `truncated` fields
+    """
+    if strategy == "mmr":
+        ordered = _order_by_mmr(results, mmr_lambda)
+    elif strategy == "score":
+        ordered = sorted(results, key=lambda result: float(result.get("score") or 0.0), reverse=True)
+    else:
+        raise ValueError(f"Invalid context packing strategy: {strategy}. Must be 'score' or 'mmr'")
+
+    separator_tokens = count_tokens("\n\n")
+    mark_tokens = count_tokens(TRUNCATION_MARK)
+    seen_units = set()
+    packed = []
+    used = 0
+
+    for result in ordered:
+        header_tokens = count_tokens(format_header(len(packed) + 1, result))
+        # Leave room for the truncation mark
+        available = token_budget - used - header_tokens - (separator_tokens if packed else 0) - mark_tokens
+        if available < MIN_SOURCE_TOKENS:
+            continue
+
+        units = []
+        duplicates = 0
+        for unit in split_units(result.get("noi_dung", "")):
+            key = _SPACE_RE.sub(" ", unit).strip().lower()
+            if key in seen_units:
+                duplicates += 1
+            else:
+                units.append((key if len(key) >= MIN_DEDUP_CHARS else None, unit))
+        # Skip sources with no new text, or only short leftovers of duplicated text
+        if not units or (duplicates and not any(key for key, _ in units)):
+            continue
+
+        kept = []
+        content_tokens = 0
+        truncated = False
+        for key, unit in units:
+            unit_tokens = count_tokens(unit)
+            if content_tokens + unit_tokens > available:
+                truncated = True
+                if not kept:
+                    # The first unit alone is too long: cut it at a word boundary
+                    cut = _cut_unit(unit.rstrip(), available)
+                    if cut:
+                        kept.append((key, cut))
+                break
+            kept.append((key, unit))
+            content_tokens += unit_tokens
+        if not kept:
+            continue
+
+        context_text = "".join(unit for _, unit in kept).rstrip()
+        if truncated and not context_text.endswith(TRUNCATION_MARK):
+            context_text += TRUNCATION_MARK
+        seen_units.update(key for key, _ in kept if key)
+
+        entry = dict(result)
+        entry["context_text"] = context_text
+        entry["context_tokens"] = count_tokens(format_header(len(packed) + 1, result) + context_text)
+        entry["truncated"] = truncated
+        packed.append(entry)
+        used += entry["context_tokens"] + (separator_tokens if len(packed) > 1 else 0)
+
+    return packed
+
@@ -7,7 +7,12 @@ import os
 from typing import Optional
 from tqdm import tqdm
 from dotenv import load_dotenv
-from libs.utils import get_mongodb_collection, get_embedding
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from libs.utils import get_mongodb_collection, get_embeddings
+from libs.vector_index import LocalVectorIndex
+from libs.bm25 import TOKENS_FIELD, TEXT_FIELDS, document_terms
+from libs.chunking import SEARCHABLE_FILTER
 
 # Load environment variables
 load_dotenv()
@@ -61,12 +66,72 @@ def combine_text_fields(doc: dict, combine_fields: bool = True) -> str:
     return combined_text
 
 
+def _embed_batch(batch: list, batch_size: int) -> tuple:
+    """
+    Create embeddings for a batch of documents with one model call.
+    
+    Args:
+        batch: List of (document _id, text to embed) pairs
+        batch_size: Model batch size
+        
+    Returns:
+        Tuple (list of (document _id, UpdateOne) pairs, number of failed documents)
+    """
+    try:
+        embeddings = get_embeddings([text for _, text in batch], batch_size=batch_size)
+    except Exception as e:
+        print(f"\nError creating embeddings for batch of {len(batch)} documents: {e}")
+        return [], len(batch)
+    
+    operations = []
+    failed = 0
+    for (doc_id, _), embedding in zip(batch, embeddings):
+        if embedding is None:
+            print(f"\nWarning: Failed to create embedding for document {doc_id}")
+            failed += 1
+            continue
+        
+        operations.append((doc_id, UpdateOne({"_id": doc_id}, {"$set": {"embedding": embedding}})))
+    
+    return operations, failed
+
+
+def _write_updates(collection, operations: list) -> tuple:
+    """
+    Write embedding updates with one unordered bulk_write call.
+    
+    Args:
+        collection: MongoDB collection
+        operations: List of (document _id, UpdateOne) pairs
+        
+    Returns:
+        Tuple (processed, failed)
+    """
+    if not operations:
+        return 0, 0
+    
+    try:
+        collection.bulk_write([operation for _, operation in operations], ordered=False)
+        return len(operations), 0
+    except BulkWriteError as e:
+        # Unordered writes keep going after an error; report each failed document
+        write_errors = e.details.get("writeErrors", [])
+        for error in write_errors:
+            doc_id = operations[error["index"]][0]
+            print(f"\nError processing document {doc_id}: {error.get('errmsg')}")
+        return len(operations) - len(write_errors), len(write_errors)
+    except Exception as e:
+        print(f"\nError writing batch of {len(operations)} documents: {e}")
+        return 0, len(operations)
+
+
 def create_embeddings_for_collection(
     db_name: Optional[str] = None,
     collection_name: Optional[str] = None,
     batch_size: int = 100,
     combine_fields: bool = True,
-    update_existing: bool = False
+    update_existing: bool = False,
+    write_batch_size: int = 500
 ):
     """
     Create embeddings for documents in MongoDB collection.
@@ -75,18 +140,20 @@ def create_embeddings_for_collection(
     Args:
         db_name: MongoDB database name (default from env)
         collection_name: MongoDB collection name (default from env)
-        batch_size: Number of documents to process in each batch
+        batch_size: Number of documents to embed with one batched model call
         combine_fields: If True, combine van_ban, loai_heading, tieu_de, noi_dung (default: True)
         update_existing: If True, update documents that already have embeddings (default: False)
+        write_batch_size: Number of embedding updates sent per bulk_write call (default: 500)
     """
     collection = get_mongodb_collection(db_name, collection_name)
     
     # Query documents without embeddings or all documents if update_existing=True
+    # Parent records of a chunked collection are not embedded
     if update_existing:
-        query = {}
+        query = dict(SEARCHABLE_FILTER)
         print("Mode: Updating ALL documents (including those with existing embeddings)")
     else:
-        query = {"embedding": {"$exists": False}}
+        query = {"embedding": {"$exists": False}, **SEARCHABLE_FILTER}
         print("Mode: Only processing documents WITHOUT embeddings")
     
     # Count total documents to process
@@ -109,44 +176,48 @@ def create_embeddings_for_collection(
         print("Combining fields: van_ban, loai_heading, tieu_de, noi_dung")
     else:
         print("Using only: noi_dung")
-    print(f"Batch size: {batch_size}\n")
+    print(f"Batch size: {batch_size}")
+    print(f"Write batch size: {write_batch_size}\n")
     
     # Process with progress bar
+    pending = []
+    operations = []
     with tqdm(total=total_docs, desc="Creating embeddings") as pbar:
         for doc in cursor:
-            try:
-                # Combine text fields
-                text_to_embed = combine_text_fields(doc, combine_fields)
-                
-                if not text_to_embed or not text_to_embed.strip():
-                    print(f"\nWarning: Document {doc.get('_id')} has no text to embed. Skipping.")
-                    failed += 1
-                    pbar.update(1)
-                    continue
-                
-                # Create embedding
-                embedding = get_embedding(text_to_embed)
-                
-                if embedding is None:
-                    print(f"\nWarning: Failed to create embedding for document {doc.get('_id')}")
-                    failed += 1
-                    pbar.update(1)
-                    continue
-                
-                # Update document with embedding
-                collection.update_one(
-                    {"_id": doc["_id"]},
-                    {"$set": {"embedding": embedding}}
-                )
-                
-                processed += 1
-                pbar.update(1)
-                
-            except Exception as e:
-                print(f"\nError processing document {doc.get('_id')}: {e}")
+            # Combine text fields
+            text_to_embed = combine_text_fields(doc, combine_fields)
+            
+            if not text_to_embed or not text_to_embed.strip():
+                print(f"\nWarning: Document {doc.get('_id')} has no text to embed. Skipping.")
                 failed += 1
                 pbar.update(1)
                 continue
+            
+            pending.append((doc["_id"], text_to_embed))
+            
+            if len(pending) >= batch_size:
+                batch_operations, batch_failed = _embed_batch(pending, batch_size)
+                operations.extend(batch_operations)
+                failed += batch_failed
+                pbar.update(len(pending))
+                pending = []
+            
+            if len(operations) >= write_batch_size:
+                batch_processed, batch_failed = _write_updates(collection, operations)
+                processed += batch_processed
+                failed += batch_failed
+                operations = []
+        
+        # Flush the last partial batches
+        if pending:
+            batch_operations, batch_failed = _embed_batch(pending, batch_size)
+            operations.extend(batch_operations)
+            failed += batch_failed
+            pbar.update(len(pending))
+        
+        batch_processed, batch_failed = _write_updates(collection, operations)
+        processed += batch_processed
+        failed += batch_failed
     
     print(f"\n{'='*50}")
     print(f"Embedding creation completed!")
@@ -156,6 +227,53 @@ def create_embeddings_for_collection(
     print(f"{'='*50}")
 
 
+def create_keyword_tokens(
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    update_existing: bool = False,
+    write_batch_size: int = 500
+):
+    """
+    Store each document's normalized keyword terms in an array field with a multikey index.
+    
+    keyword_search falls back to this index when there is no $text index, so
+    queries become indexed $in lookups instead of regex scans.
+    
+    Args:
+        db_name: MongoDB database name (default from env)
+        collection_name: MongoDB collection name (default from env)
+        update_existing: If True, recompute terms for documents that already have them
+        write_batch_size: Number of updates sent per bulk_write call (default: 500)
+    """
+    collection = get_mongodb_collection(db_name, collection_name)
+    
+    query = dict(SEARCHABLE_FILTER) if update_existing else {TOKENS_FIELD: {"$exists": False}, **SEARCHABLE_FILTER}
+    total_docs = collection.count_documents(query)
+    print(f"\nDocuments to tokenize: {total_docs}")
+    
+    processed = 0
+    failed = 0
+    operations = []
+    projection = {field: 1 for field in TEXT_FIELDS}
+    with tqdm(total=total_docs, desc="Creating keyword tokens") as pbar:
+        for doc in collection.find(query, projection):
+            operations.append((doc["_id"], UpdateOne({"_id": doc["_id"]}, {"$set": {TOKENS_FIELD: document_terms(doc)}})))
+            pbar.update(1)
+            
+            if len(operations) >= write_batch_size:
+                batch_processed, batch_failed = _write_updates(collection, operations)
+                processed += batch_processed
+                failed += batch_failed
+                operations = []
+        
+        batch_processed, batch_failed = _write_updates(collection, operations)
+        processed += batch_processed
+        failed += batch_failed
+    
+    collection.create_index(TOKENS_FIELD)
+    print(f"Keyword tokens: processed {processed}, failed {failed}; index on '{TOKENS_FIELD}' is ready")
+
+
 def verify_embeddings(
     db_name: Optional[str] = None,
     collection_name: Optional[str] = None
@@ -171,7 +289,7 @@ def verify_embeddings(
     
     total = collection.count_documents({})
     with_embedding = collection.count_documents({"embedding": {"$exists": True}})
-    without_embedding = collection.count_documents({"embedding": {"$exists": False}})
+    without_embedding = collection.count_documents({"embedding": {"$exists": False}, **SEARCHABLE_FILTER})
     
     print(f"\n{'='*50}")
     print(f"Embedding Status:")
@@ -191,6 +309,32 @@ def verify_embeddings(
         print(f"Sample document: {sample.get('tieu_de', 'N/A')[:50]}...")
 
 
+def export_embeddings(
+    output_dir: str,
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None
+):
+    """
+    Export collection embeddings to an on-disk vector store.
+    
+    The store holds a float32 `embeddings.npy` matrix and a parallel
+    `metadata.json` keyed by stable chunk id. Point VECTOR_STORE_PATH at it and
+    use VECTOR_BACKEND=local to search without scanning MongoDB on startup.
+    
+    Args:
+        output_dir: Store directory
+        db_name: MongoDB database name (default from env)
+        collection_name: MongoDB collection name (default from env)
+    """
+    collection = get_mongodb_collection(db_name, collection_name)
+    
+    print(f"\nExporting embeddings to: {output_dir}")
+    index = LocalVectorIndex.from_collection(collection)
+    index.save(output_dir)
+    
+    print(f"Exported {len(index)} embeddings (dimension: {index.dimension})")
+
+
 if __name__ == "__main__":
     import argparse
     
@@ -211,7 +355,13 @@ if __name__ == "__main__":
         "--batch-size",
         type=int,
         default=100,
-        help="Batch size for processing (default: 100)"
+        help="Number of documents per batched model call (default: 100)"
+    )
+    parser.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=500,
+        help="Number of embedding updates per bulk_write call (default: 500)"
     )
     parser.add_argument(
         "--no-combine-fields",
@@ -228,18 +378,46 @@ if __name__ == "__main__":
         action="store_true",
         help="Only verify embeddings, don't create them"
     )
+    parser.add_argument(
+        "--keyword-tokens",
+        action="store_true",
+        help="Only build the keyword token field and its index (used when there is no text index)"
+    )
+    parser.add_argument(
+        "--export-store",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Only export existing embeddings to an on-disk vector store in DIR"
+    )
     
     args = parser.parse_args()
     
     if args.verify_only:
         verify_embeddings(args.db_name, args.collection_name)
+    elif args.export_store:
+        export_embeddings(args.export_store, args.db_name, args.collection_name)
+    elif args.keyword_tokens:
+        create_keyword_tokens(
+            db_name=args.db_name,
+            collection_name=args.collection_name,
+            update_existing=args.update_existing,
+            write_batch_size=args.write_batch_size
+        )
     else:
         create_embeddings_for_collection(
             db_name=args.db_name,
             collection_name=args.collection_name,
             batch_size=args.batch_size,
             combine_fields=not args.no_combine_fields,
-            update_existing=args.update_existing
+            update_existing=args.update_existing,
+            write_batch_size=args.write_batch_size
+        )
+        create_keyword_tokens(
+            db_name=args.db_name,
+            collection_name=args.collection_name,
+            update_existing=args.update_existing,
+            write_batch_size=args.write_batch_size
         )
         
         # Verify after creation
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Score fusion strategies for hybrid search
+Merges keyword and semantic candidate lists into one ranking
+"""
+from typing import List, Dict, Literal
+
+import numpy as np
+
+# Fusion strategy type
+FusionStrategy = Literal["weighted", "rrf", "minmax", "zscore"]
+
+FUSION_STRATEGIES = ("weighted", "rrf", "minmax", "zscore")
+
+# Rank constant for Reciprocal Rank Fusion (Cormack et al., 2009)
+DEFAULT_RRF_K = 60
+
+
+def result_key(result: Dict) -> str:
+    """
+    Key used to match the same document across candidate lists.
+    
+    Uses the chunk id when the result has one, so chunks of the same
+    article are kept apart.
+    """
+    return result.get("chunk_id") or f"{result.get('van_ban', '')}_{result.get('tieu_de', '')}"
+
+
+def fuse_results(
+    keyword_results: List[Dict],
+    semantic_results: List[Dict],
+    limit: int,
+    strategy: FusionStrategy = "weighted",
+    keyword_weight: float = 0.3,
+    semantic_weight: float = 0.7,
+    rrf_k: int = DEFAULT_RRF_K
+) -> List[Dict]:
+    """
+    Fuse keyword and semantic search results.
+
+    Strategies:
+        - "weighted": keyword score clamped to 1.0, then linear blend of raw scores
+        - "rrf": Reciprocal Rank Fusion, weight / (rrf_k + rank) summed over legs
+        - "minmax": linear blend of scores min-max normalized per leg
+        - "zscore": linear blend of scores z-score normalized per leg
+
+    Args:
+        keyword_results: Keyword search results, best first
+        semantic_results: Semantic search results, best first
+        limit: Maximum number of results
+        strategy: Fusion strategy
+        keyword_weight: Weight for the keyword leg
+        semantic_weight: Weight for the semantic leg
+        rrf_k: Rank constant for "rrf"
+
+    Returns:
+        List of fused results sorted by combined score, with `keyword_score`,
+        `semantic_score`, `score`, `search_type` and `fusion` fields
+    """
+    if strategy not in FUSION_STRATEGIES:
+        raise ValueError(f"Invalid fusion strategy: {strategy}. Must be one of {', '.join(FUSION_STRATEGIES)}")
+
+    # Union of candidates, in order of first appearance
+    positions = {}
+    candidates = []
+    for result in list(keyword_results) + list(semantic_results):
+        key = result_key(result)
+        if key not in positions:
+            positions[key] = len(candidates)
+            candidates.append(result)
+
+    if not candidates:
+        return []
+
+    keyword_scores, keyword_ranks = _leg_arrays(keyword_results, positions, len(candidates))
+    semantic_scores, semantic_ranks = _leg_arrays(semantic_results, positions, len(candidates))
+
+    if strategy == "weighted":
+        combined = (
+            keyword_weight * np.nan_to_num(np.minimum(keyword_scores, 1.0)) +
+            semantic_weight * np.nan_to_num(semantic_scores)
+        )
+    elif strategy == "rrf":
+        combined = (
+            keyword_weight * _reciprocal_ranks(keyword_ranks, rrf_k) +
+            semantic_weight * _reciprocal_ranks(semantic_ranks, rrf_k)
+        )
+    elif strategy == "minmax":
+        combined = (
+            keyword_weight * _minmax(keyword_scores) +
+            semantic_weight * _minmax(semantic_scores)
+        )
+    else:
+        combined = (
+            keyword_weight * _zscore(keyword_scores) +
+            semantic_weight * _zscore(semantic_scores)
+        )
+
+    order = np.argsort(-combined, kind="stable")[:limit]
+
+    fused = []
+    for idx in order:
+        result = candidates[idx].copy()
+        result["keyword_score"] = float(np.nan_to_num(keyword_scores[idx]))
+        result["semantic_score"] = float(np.nan_to_num(semantic_scores[idx]))
+        result["score"] = float(combined[idx])
+        result["search_type"] = "hybrid"
+        result["fusion"] = strategy
+        fused.append(result)
+
+    return fused
+
+
+def _leg_arrays(results: List[Dict], positions: Dict[str, int], size: int):
+    """
+    Scatter one leg's scores and 1-based ranks into candidate-aligned arrays.
+
+    Candidates missing from the leg get NaN. Duplicates keep the best score and rank.
+    """
+    scores = np.full(size, np.nan)
+    ranks = np.full(size, np.nan)
+    for rank, result in enumerate(results, 1):
+        idx = positions[result_key(result)]
+        score = result.get("score", 0.0) or 0.0
+        if np.isnan(scores[idx]) or score > scores[idx]:
+            scores[idx] = score
+        if np.isnan(ranks[idx]):
+            ranks[idx] = rank
+    return scores, ranks
+
+
+def _reciprocal_ranks(ranks: np.ndarray, rrf_k: int) -> np.ndarray:
+    return np.nan_to_num(1.0 / (rrf_k + ranks))
+
+
+def _minmax(scores: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(scores)
+    normalized = np.zeros_like(scores)
+    if not present.any():
+        return normalized
+    low = scores[present].min()
+    high = scores[present].max()
+    if high > low:
+        normalized[present] = (scores[present] - low) / (high - low)
+    else:
+        normalized[present] = 1.0
+    return normalized
+
+
+def _zscore(scores: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(scores)
+    normalized = np.zeros_like(scores)
+    if not present.any():
+        return normalized
+    std = scores[present].std()
+    if std > 0:
+        normalized[present] = (scores[present] - scores[present].mean()) / std
+    # Candidates missing from the leg rank below all of its hits
+    normalized[~present] = normalized[present].min()
+    return normalized
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Conversation memory for follow-up questions
+Keeps recent turns within a token budget, summarizes older turns with the LLM,
+and rewrites follow-up questions into standalone search queries.
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import List, Dict, Optional
+
+from .cache import LRUCache, normalize_query
+from .utils import count_tokens
+
+# Rewritten queries shared by all conversations, created on first use
+_rewrite_cache = None
+_rewrite_cache_lock = threading.Lock()
+
+REWRITE_PROMPT = """Dựa vào lịch sử hội thoại và câu hỏi tiếp theo của người dùng, hãy viết lại câu hỏi tiếp theo thành một câu hỏi độc lập, đầy đủ ý, có thể hiểu được mà không cần lịch sử hội thoại. Giữ nguyên các thuật ngữ pháp lý. Chỉ trả về câu hỏi đã viết lại, không giải thích.
+
+Lịch sử hội thoại:
+{history}
+
+Câu hỏi tiếp theo: {question}
+
+Câu hỏi độc lập:"""
+
+SUMMARY_PROMPT = """Tóm tắt ngắn gọn cuộc hội thoại tư vấn pháp luật dưới đây, giữ lại các chủ đề, đối tượng, điều luật và thông tin người dùng đã nêu. Chỉ trả về bản tóm tắt.
+
+{summary}{history}
+
+Tóm tắt:"""
+
+
+def get_rewrite_cache() -> Optional[LRUCache]:
+    """
+    Get the query rewrite cache, creating it on first use.
+
+    Size comes from env QUERY_REWRITE_CACHE_SIZE (default: 1024, 0 disables caching).
+
+    Returns:
+        LRUCache, or None if caching is disabled
+    """
+    global _rewrite_cache
+
+    with _rewrite_cache_lock:
+        if _rewrite_cache is None:
+            maxsize = int(os.getenv("QUERY_REWRITE_CACHE_SIZE", "1024"))
+            if maxsize <= 0:
+                return None
+            _rewrite_cache = LRUCache(maxsize=maxsize)
+
+    return _rewrite_cache
+
+
+class ConversationMemory:
+    """
+    Bounded memory of one conversation.
+
+    Recent turns are kept verbatim while they fit in `max_tokens`; when the
+    budget is exceeded, the oldest turns are folded into a running summary
+    by the LLM (or dropped if no LLM is available). The most recent turn is
+    always kept verbatim.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        """
+        Initialize memory.
+
+        Args:
+            max_tokens: Token budget for summary plus recent turns
+                (default from env MEMORY_TOKEN_BUDGET, else 1500)
+        """
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def is_empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+
+    def to_dict(self) -> Dict:
+        """
+        Serialize memory (e.g. to send it to the RAG service).
+        """
+        return {"summary": self.summary, "turns": [dict(turn) for turn in self.turns]}
+
+    @classmethod
+    def from_dict(cls, data: Dict, max_tokens: Optional[int] = None) -> "ConversationMemory":
+        """
+        Create memory from the output of `to_dict`.
+        """
+        memory = cls(max_tokens=max_tokens)
+        memory.update(data)
+        return memory
+
+    def update(self, data: Dict):
+        """
+        Replace the memory contents with the output of `to_dict`.
+        """
+        self.summary = str(data.get("summary") or "")
+        self.turns = [
+            {"question": str(turn.get("question", "")), "answer": str(turn.get("answer", ""))}
+            for turn in data.get("turns") or []
+        ]
+
+    def history_hash(self) -> str:
+        """
+        Hash of the memory contents, used in cache keys.
+        """
+        payload = json.dumps([self.summary, self.turns], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def format_history(self) -> str:
+        """
+        Format summary and recent turns for a prompt.
+        """
+        parts = []
+        if self.summary:
+            parts.append(f"Tóm tắt trước đó: {self.summary}")
+        parts.extend(_format_turn(turn) for turn in self.turns)
+        return "\n".join(parts)
+
+    def count_tokens(self) -> int:
+        return count_tokens(self.summary) + sum(count_tokens(_format_turn(turn)) for turn in self.turns)
+
+    def add_turn(self, question: str, answer: str, llm=None):
+        """
+        Record a question and its answer, then compact the memory to the token budget.
+
+        Args:
+            question: User question as asked
+            answer: Assistant answer
+            llm: LangChain chat model used to summarize older turns (optional)
+        """
+        self.turns.append({"question": question, "answer": answer})
+        self.compact(llm)
+
+    def compact(self, llm=None):
+        """
+        Fold the oldest turns into the summary until the memory fits its budget.
+
+        Args:
+            llm: LangChain chat model used to summarize; without it, old turns are dropped
+        """
+        if len(self.turns) <= 1 or self.count_tokens() <= self.max_tokens:
+            return
+
+        # Keep the newest turns that fit in half the budget, at least one
+        kept = 0
+        kept_tokens = 0
+        for turn in reversed(self.turns):
+            turn_tokens = count_tokens(_format_turn(turn))
+            if kept and kept_tokens + turn_tokens > self.max_tokens // 2:
+                break
+            kept += 1
+            kept_tokens += turn_tokens
+
+        old_turns = self.turns[:-kept]
+        if not old_turns:
+            return
+        self.turns = self.turns[-kept:]
+
+        if llm is None:
+            return
+
+        try:
+            summary = f"Tóm tắt trước đó: {self.summary}\n" if self.summary else ""
+            prompt = SUMMARY_PROMPT.format(
+                summary=summary,
+                history="\n".join(_format_turn(turn) for turn in old_turns)
+            )
+            self.summary = llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+
+    def rewrite_query(self, question: str, llm) -> str:
+        """
+        Rewrite a follow-up question into a standalone search query.
+
+        Results are cached per (history hash, normalized question, model).
+
+        Args:
+            question: Follow-up question
+            llm: LangChain chat model
+
+        Returns:
+            Standalone query (the question itself if there is no history or the rewrite fails)
+        """
+        if self.is_empty():
+            return question
+
+        cache = get_rewrite_cache()
+        key = self._rewrite_cache_key(question, llm)
+        if cache is not None:
+            rewritten = cache.get(key)
+            if rewritten is not None:
+                return rewritten
+
+        try:
+            prompt = REWRITE_PROMPT.format(history=self.format_history(), question=question)
+            rewritten = llm.invoke(prompt).content.strip() or question
+        except Exception as e:
+            print(f"Error rewriting query: {e}")
+            return question
+
+        if cache is not None:
+            cache.set(key, rewritten)
+        return rewritten
+
+    async def arewrite_query(self, question: str, llm) -> str:
+        """
+        Async version of rewrite_query (uses the LLM's ainvoke).
+        """
+        if self.is_empty():
+            return question
+
+        cache = get_rewrite_cache()
+        key = self._rewrite_cache_key(question, llm)
+        if cache is not None:
+            rewritten = cache.get(key)
+            if rewritten is not None:
+                return rewritten
+
+        try:
+            prompt = REWRITE_PROMPT.format(history=self.format_history(), question=question)
+            rewritten = (await llm.ainvoke(prompt)).content.strip() or question
+        except Exception as e:
+            print(f"Error rewriting query: {e}")
+            return question
+
+        if cache is not None:
+            cache.set(key, rewritten)
+        return rewritten
+
+    def _rewrite_cache_key(self, question: str, llm) -> str:
+        return json.dumps(
+            [self.history_hash(), normalize_query(question), getattr(llm, "model_name", "")],
+            ensure_ascii=False
+        )
+
+
+def _format_turn(turn: Dict[str, str]) -> str:
+    return f"Người dùng: {turn['question']}\nTrợ lý: {turn['answer']}"
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+ONNX Runtime backend for the embedding model
+Exports keepitreal/vietnamese-sbert to ONNX once (optionally int8-quantized) into
+models/ and runs it with ONNX Runtime on CPU.
+
+Select with env EMBEDDING_BACKEND=onnx or EMBEDDING_BACKEND=onnx-int8.
+Export and check parity: python -m libs.onnx_encoder --quantize --check
+"""
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+from .utils import EMBEDDING_MODEL_NAME, MODELS_DIR, load_torch_embedding_model, get_local_model_path
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+# Sample queries for the parity check
+PARITY_TEXTS = [
+    "điều kiện hưởng lương hưu",
+    "bảo hiểm xã hội một lần",
+    "Người lao động nghỉ việc có được hưởng trợ cấp thất nghiệp không?",
+    "mức đóng bảo hiểm xã hội tự nguyện",
+    "Điều 2. Đối tượng tham gia bảo hiểm xã hội bắt buộc và bảo hiểm xã hội tự nguyện",
+    "chế độ thai sản khi sinh con",
+]
+
+
+def get_onnx_dir() -> Path:
+    """
+    Directory holding the exported ONNX models.
+    """
+    return MODELS_DIR / (EMBEDDING_MODEL_NAME.replace("/", "_") + "_onnx")
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence encoder running the exported transformer with ONNX Runtime.
+
+    Implements the subset of SentenceTransformer.encode used by this project,
+    with the same tokenizer, max sequence length and pooling as the torch model.
+    """
+
+    def __init__(self, onnx_path: Union[str, Path], model_dir: Union[str, Path]):
+        """
+        Initialize encoder.
+
+        Args:
+            onnx_path: Exported ONNX model file
+            model_dir: Saved SentenceTransformer directory (tokenizer and pooling config)
+        """
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(
+                "onnxruntime is required for the ONNX embedding backend. "
+                "Install it with: pip install -e \".[onnx]\""
+            ) from e
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        sentence_bert_config = _read_sentence_bert_config(model_dir)
+        self.max_seq_length = sentence_bert_config.get("max_seq_length") or min(self.tokenizer.model_max_length, 512)
+        self.do_lower_case = bool(sentence_bert_config.get("do_lower_case", False))
+        self.pooling_mode = _read_pooling_mode(model_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            str(onnx_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode sentences to embeddings.
+
+        Args:
+            sentences: One sentence or a list of sentences
+            batch_size: Sentences per ONNX Runtime call
+            normalize_embeddings: Scale embeddings to unit length
+
+        Returns:
+            Array of shape (dim,) for one sentence, (len(sentences), dim) for a list
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Encode longest first so each batch has similar lengths
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]), reverse=True)
+        outputs = [None] * len(sentences)
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            # Same preprocessing as sentence_transformers.models.Transformer
+            texts = [str(sentences[i]).strip() for i in indices]
+            if self.do_lower_case:
+                texts = [text.lower() for text in texts]
+            features = self.tokenizer(
+                texts,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            inputs = {
+                name: value.astype(np.int64)
+                for name, value in features.items()
+                if name in self.input_names
+            }
+            token_embeddings = self.session.run(None, inputs)[0]
+            embeddings = _pool(token_embeddings, features["attention_mask"], self.pooling_mode)
+            for i, embedding in zip(indices, embeddings):
+                outputs[i] = embedding
+
+        embeddings = np.stack(outputs).astype(np.float32) if outputs else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx_model(quantize: bool = False, overwrite: bool = False) -> Path:
+    """
+    Export the embedding transformer to ONNX, and optionally an int8 variant.
+
+    Args:
+        quantize: Also write a dynamically int8-quantized model
+        overwrite: Re-export even if the files already exist
+
+    Returns:
+        Path of the requested model (int8 if `quantize`, else fp32)
+    """
+    onnx_dir = get_onnx_dir()
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+    onnx_path = onnx_dir / ONNX_FILE
+    int8_path = onnx_dir / ONNX_INT8_FILE
+
+    if overwrite or not onnx_path.exists():
+        import torch
+
+        model = load_torch_embedding_model()
+        transformer = model[0].auto_model.eval()
+        tokenizer = model.tokenizer
+        sample = tokenizer(["xin chào"], return_tensors="pt")
+        input_names = ["input_ids", "attention_mask"]
+
+        print(f"Exporting embedding model to ONNX: {onnx_path}")
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                (sample["input_ids"], sample["attention_mask"]),
+                str(onnx_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14
+            )
+
+    if quantize and (overwrite or not int8_path.exists()):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"Quantizing ONNX model to int8: {int8_path}")
+        quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    return int8_path if quantize else onnx_path
+
+
+def load_onnx_encoder(quantized: bool = False) -> OnnxSentenceEncoder:
+    """
+    Load the ONNX encoder, exporting the model first if needed.
+
+    Args:
+        quantized: Use the int8-quantized model
+
+    Returns:
+        OnnxSentenceEncoder instance
+    """
+    onnx_path = get_onnx_dir() / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+    if not onnx_path.exists():
+        export_onnx_model(quantize=quantized)
+
+    model_dir = get_local_model_path()
+    if not model_dir.exists():
+        load_torch_embedding_model()
+
+    print(f"Loading ONNX embedding model: {onnx_path}")
+    return OnnxSentenceEncoder(onnx_path, model_dir)
+
+
+def check_onnx_parity(
+    texts: Optional[List[str]] = None,
+    quantized: bool = False,
+    threshold: float = 0.99
+) -> Dict:
+    """
+    Compare ONNX embeddings against the torch model.
+
+    Args:
+        texts: Texts to compare (default: PARITY_TEXTS)
+        quantized: Check the int8-quantized model
+        threshold: Minimum cosine similarity required for every text
+
+    Returns:
+        Dictionary with min_cosine, mean_cosine, threshold and passed
+    """
+    texts = texts or PARITY_TEXTS
+
+    torch_embeddings = load_torch_embedding_model().encode(texts, normalize_embeddings=True)
+    onnx_embeddings = load_onnx_encoder(quantized).encode(texts, normalize_embeddings=True)
+    cosines = np.sum(np.asarray(torch_embeddings) * onnx_embeddings, axis=1)
+
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "threshold": threshold,
+        "passed": bool(cosines.min() >= threshold),
+    }
+
+
+def _pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "cls":
+        return token_embeddings[:, 0]
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def _read_pooling_mode(model_dir: Path) -> str:
+    config_path = model_dir / "1_Pooling" / "config.json"
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config.get("pooling_mode_cls_token"):
+            return "cls"
+    return "mean"
+
+
+def _read_sentence_bert_config(model_dir: Path) -> Dict:
+    # max_seq_length and do_lower_case of the SentenceTransformer Transformer module
+    config_path = model_dir / "sentence_bert_config.json"
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and check parity")
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Also export a dynamic int8-quantized model"
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Re-export even if ONNX files exist"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Compare ONNX embeddings with the torch model"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.99,
+        help="Minimum cosine similarity for the parity check (default: 0.99)"
+    )
+
+    args = parser.parse_args()
+
+    export_onnx_model(quantize=args.quantize, overwrite=args.overwrite)
+
+    if args.check:
+        for quantized in ([False, True] if args.quantize else [False]):
+            result = check_onnx_parity(quantized=quantized, threshold=args.threshold)
+            name = "onnx-int8" if quantized else "onnx"
+            status = "PASS" if result["passed"] else "FAIL"
+            print(
+                f"{name}: min cosine {result['min_cosine']:.5f}, "
+                f"mean cosine {result['mean_cosine']:.5f} "
+                f"(threshold {result['threshold']}) -> {status}"
+            )
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Cross-encoder re-ranking of hybrid search candidates
+Scores (query, chunk) pairs with a small multilingual cross-encoder on CPU,
+caches pair scores, and skips re-ranking when it would exceed a latency budget.
+"""
+import os
+import json
+import hashlib
+import time
+import threading
+from typing import List, Dict, Optional
+
+from .cache import LRUCache, normalize_text
+from .utils import MODELS_DIR
+
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+# Fused candidates scored by the cross-encoder
+DEFAULT_RERANK_TOP_M = 20
+
+DEFAULT_RERANK_BATCH_SIZE = 16
+
+# Chunk text beyond this is not scored (the model reads at most 512 tokens)
+RERANK_MAX_CHARS = 1500
+
+# Weight of the newest measurement in the per-pair latency estimate
+LATENCY_EMA_ALPHA = 0.2
+
+# Each skipped call lowers the latency estimate by this factor, so a transient
+# spike does not disable re-ranking for good: once the estimate is back under
+# budget, the next call scores again and measures the real cost
+SKIP_DECAY = 0.8
+
+# Text used to seed the latency estimate with realistic pair lengths
+_WARMUP_QUERY = "Điều kiện hưởng lương hưu của người lao động tham gia bảo hiểm xã hội bắt buộc là gì?"
+_WARMUP_PASSAGE = (
+    "Người lao động tham gia bảo hiểm xã hội bắt buộc khi nghỉ việc có đủ tuổi nghỉ hưu "
+    "và có thời gian đóng bảo hiểm xã hội từ đủ 15 năm trở lên thì được hưởng lương hưu. "
+)
+
+# Shared reranker, created on first use
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+class CrossEncoderReranker:
+    """
+    Re-ranks search results with a cross-encoder.
+
+    The time per (query, chunk) pair is tracked as an exponential moving
+    average; when scoring the uncached pairs is expected to take longer than
+    the latency budget, or a batch runs past it, the fused order is kept.
+    Skipped calls decay the estimate (SKIP_DECAY), so re-ranking is retried
+    and re-measured instead of staying off after a slow spell.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        latency_budget_ms: Optional[float] = None,
+        cache_size: Optional[int] = None
+    ):
+        """
+        Initialize reranker. The model is loaded on first use.
+
+        Args:
+            model_name: Cross-encoder model (default from env RERANK_MODEL,
+                else cross-encoder/mmarco-mMiniLMv2-L12-H384-v1)
+            batch_size: Pairs per model call (default from env RERANK_BATCH_SIZE, else 16)
+            latency_budget_ms: Maximum time for scoring (default from env
+                RERANK_LATENCY_BUDGET_MS, else 500; 0 disables the budget)
+            cache_size: Cached pair scores (default from env RERANK_CACHE_SIZE,
+                else 4096; 0 disables caching)
+        """
+        self.model_name = model_name or os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL)
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", str(DEFAULT_RERANK_BATCH_SIZE)))
+        if latency_budget_ms is None:
+            latency_budget_ms = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "500"))
+        self.latency_budget = latency_budget_ms / 1000.0
+        if cache_size is None:
+            cache_size = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+        self.cache = LRUCache(maxsize=cache_size) if cache_size > 0 else None
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.seconds_per_pair: Optional[float] = None
+        self.skipped = 0
+
+    @property
+    def model(self):
+        """
+        The CrossEncoder model, loaded (and saved to models/) on first access.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        # Imported here: sentence_transformers pulls in torch and transformers
+        from sentence_transformers import CrossEncoder
+
+        model_path = MODELS_DIR / self.model_name.replace("/", "_")
+        if model_path.exists() and any(model_path.iterdir()):
+            print(f"Loading rerank model from local: {model_path}")
+            return CrossEncoder(str(model_path), device="cpu")
+
+        print(f"Downloading rerank model: {self.model_name}")
+        model = CrossEncoder(self.model_name, device="cpu")
+        print(f"Saving model to: {model_path}")
+        MODELS_DIR.mkdir(exist_ok=True)
+        model.save(str(model_path))
+        return model
+
+    def warmup(self):
+        """
+        Load the model and seed the latency estimate with one batch of
+        full-length pairs (after an untimed first run).
+        """
+        passage = (_WARMUP_PASSAGE * (RERANK_MAX_CHARS // len(_WARMUP_PASSAGE) + 1))[:RERANK_MAX_CHARS]
+        pairs = [(_WARMUP_QUERY, passage)] * self.batch_size
+        self.model.predict(pairs[:1], show_progress_bar=False)
+        self.seconds_per_pair = None
+        self._score_batch(pairs)
+
+    def _score_batch(self, pairs: List[tuple]) -> List[float]:
+        # Load the model before starting the timer, so loading is not measured as latency
+        model = self.model
+        started = time.perf_counter()
+        scores = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        elapsed = (time.perf_counter() - started) / len(pairs)
+        if self.seconds_per_pair is None:
+            self.seconds_per_pair = elapsed
+        else:
+            self.seconds_per_pair += LATENCY_EMA_ALPHA * (elapsed - self.seconds_per_pair)
+        return [float(score) for score in scores]
+
+    @staticmethod
+    def _passage(result: Dict) -> str:
+        return (result.get("noi_dung") or "")[:RERANK_MAX_CHARS]
+
+    def _cache_key(self, query: str, passage: str) -> str:
+        # Keyed on the exact text scored, so re-chunked or expanded results never reuse a stale score
+        return json.dumps(
+            [query, hashlib.sha1(passage.encode("utf-8")).hexdigest()],
+            ensure_ascii=False
+        )
+
+    def rerank(self, query: str, results: List[Dict], limit: int) -> List[Dict]:
+        """
+        Order results by cross-encoder score and keep the top `limit`.
+
+        Args:
+            query: Search query
+            results: Candidates, best first
+            limit: Maximum number of results
+
+        Returns:
+            Copies of the best results with `score` set to the cross-encoder
+            score (the previous score is kept in `fused_score`), or the first
+            `limit` candidates unchanged if re-ranking was skipped or failed
+        """
+        if len(results) <= 1:
+            return results[:limit]
+
+        # The model is case-sensitive, so pair scores are keyed on the exact (normalized) query it scores
+        query = normalize_text(query)
+
+        passages = [self._passage(result) for result in results]
+        keys = [self._cache_key(query, passage) for passage in passages]
+        scores = [self.cache.get(key) if self.cache is not None else None for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            budget = self.latency_budget
+            if budget > 0 and self.seconds_per_pair is not None and self.seconds_per_pair * len(missing) > budget:
+                self.skipped += 1
+                self.seconds_per_pair *= SKIP_DECAY
+                print(f"Warning: re-ranking {len(missing)} candidates would exceed the latency budget, skipping.")
+                return results[:limit]
+
+            try:
+                # Load the model before starting the budget clock
+                self.model
+                started = time.perf_counter()
+                for start in range(0, len(missing), self.batch_size):
+                    batch = missing[start:start + self.batch_size]
+                    pairs = [(query, passages[i]) for i in batch]
+                    for i, score in zip(batch, self._score_batch(pairs)):
+                        scores[i] = score
+                        if self.cache is not None:
+                            self.cache.set(keys[i], score)
+                    if budget > 0 and time.perf_counter() - started > budget and start + self.batch_size < len(missing):
+                        self.skipped += 1
+                        print("Warning: re-ranking exceeded the latency budget, keeping fused order.")
+                        return results[:limit]
+            except Exception as e:
+                print(f"Error re-ranking results: {e}")
+                return results[:limit]
+
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:limit]
+        reranked = []
+        for i in order:
+            result = dict(results[i])
+            result["fused_score"] = result.get("score", 0.0)
+            result["score"] = scores[i]
+            result["reranked"] = True
+            reranked.append(result)
+        return reranked
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """
+    Get the shared reranker, creating it on first use.
+    """
+    global _reranker
+
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+
+    return _reranker
@@ -4,12 +4,37 @@ RAG System for Legal Document Search
 Supports keyword search, semantic search, and hybrid search
 """
 import os
-from typing import List, Dict, Optional, Literal
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Optional, Literal, Union, Iterator, AsyncIterator, TYPE_CHECKING
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI, ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from pymongo.errors import OperationFailure
 
-from .utils import get_embedding, get_mongodb_collection
+from .utils import (
+    get_embedding,
+    get_mongodb_collection,
+    make_chunk_id,
+    resolve_collection_names,
+    warmup as warmup_embedding_model,
+)
+from .cache import LRUCache, SQLiteCache, normalize_query
+from .vector_index import LocalVectorIndex
+from .bm25 import BM25Index, TOKENS_FIELD, tokenize
+from .fusion import FusionStrategy, fuse_results
+from .chunking import CHUNK_FIELDS, SEARCHABLE_FILTER, expand_to_parents
+from .context import PackStrategy, DEFAULT_CONTEXT_TOKEN_BUDGET, pack_context, format_context
+from .rerank import DEFAULT_RERANK_TOP_M, get_reranker
+from .memory import ConversationMemory
+
+if TYPE_CHECKING:
+    # LangChain is imported on first use to keep `import libs` fast
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +42,86 @@ load_dotenv()
 # Search mode type
 SearchMode = Literal["keyword", "semantic", "hybrid"]
 
+# Vector search backend type
+VectorBackend = Literal["atlas", "local"]
+
+# Keyword search backend type
+KeywordBackend = Literal["mongo", "bm25"]
+
+# Answer cache backend type
+AnswerCacheBackend = Literal["none", "memory", "sqlite"]
+
+# Bump when the prompt template or context format changes, so cached answers are not reused
+PROMPT_TEMPLATE_VERSION = "2"
+
+NO_RESULTS_ANSWER = "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn trong cơ sở dữ liệu."
+ERROR_ANSWER = "Xin lỗi, có lỗi xảy ra khi tạo câu trả lời. Vui lòng thử lại."
+
+# Best-matching documents returned by the server to the token index fallback of keyword search
+TOKEN_SEARCH_CANDIDATES = 200
+
+# Maximum query terms sent to the token index
+TOKEN_SEARCH_MAX_TERMS = 64
+
+DEFAULT_ANSWER_CACHE_PATH = Path(__file__).parent.parent / "cache" / "answer_cache.sqlite"
+
+# Shared systems for the convenience functions, keyed by (db_name, collection_name, num_results)
+_rag_systems = {}
+_rag_systems_lock = threading.Lock()
+
+# One lock per key, so building one system does not block lookups of the others
+_rag_system_build_locks = {}
+
+# Bumped by invalidate_rag_systems, so a system built across an invalidation is not cached
+_rag_systems_generation = 0
+
+# Thread pool shared by all systems for running hybrid search legs concurrently
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared search thread pool, creating it on first use.
+    
+    Size comes from env SEARCH_MAX_WORKERS (default: 8).
+    """
+    global _search_executor
+    
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SEARCH_MAX_WORKERS", "8")),
+                thread_name_prefix="legal-search"
+            )
+    
+    return _search_executor
+
+
+# Bounded thread pool for the embedding model in the async API
+_embedding_executor = None
+_embedding_executor_lock = threading.Lock()
+
+
+def _get_embedding_executor() -> ThreadPoolExecutor:
+    """
+    Get the embedding thread pool, creating it on first use.
+    
+    Size comes from env EMBEDDING_MAX_WORKERS (default: 2). Keeping it small
+    stops concurrent async requests from oversubscribing the CPU with
+    parallel model forward passes.
+    """
+    global _embedding_executor
+    
+    with _embedding_executor_lock:
+        if _embedding_executor is None:
+            _embedding_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("EMBEDDING_MAX_WORKERS", "2")),
+                thread_name_prefix="legal-embedding"
+            )
+    
+    return _embedding_executor
+
 
 class LegalRAGSystem:
     """
@@ -27,7 +132,14 @@ class LegalRAGSystem:
         self,
         db_name: Optional[str] = None,
         collection_name: Optional[str] = None,
-        num_results: int = 5
+        num_results: int = 5,
+        vector_backend: Optional[VectorBackend] = None,
+        vector_store_path: Optional[str] = None,
+        answer_cache: Optional[Union[AnswerCacheBackend, LRUCache, SQLiteCache]] = None,
+        keyword_backend: Optional[KeywordBackend] = None,
+        context_token_budget: Optional[int] = None,
+        context_packing: Optional[PackStrategy] = None,
+        rerank: Optional[bool] = None
     ):
         """
         Initialize RAG system.
@@ -36,17 +148,58 @@ class LegalRAGSystem:
             db_name: MongoDB database name (default from env)
             collection_name: MongoDB collection name (default from env)
             num_results: Number of results to return (default: 5)
+            vector_backend: "atlas" for MongoDB Atlas $vectorSearch or "local" for
+                the in-process NumPy index (default from env VECTOR_BACKEND, else "atlas")
+            vector_store_path: On-disk embedding store for the "local" backend
+                (default from env VECTOR_STORE_PATH). If missing, the local index
+                is built from the MongoDB collection instead
+            answer_cache: Answer cache backend - "none", "memory" or "sqlite", or a
+                cache object with get/set/clear (default from env ANSWER_CACHE_BACKEND,
+                else "memory")
+            keyword_backend: "mongo" for MongoDB $text search or "bm25" for the
+                in-process BM25 index (default from env KEYWORD_BACKEND, else "mongo")
+            context_token_budget: Maximum tokens of retrieved text in the prompt
+                (default from env CONTEXT_TOKEN_BUDGET, else 3000)
+            context_packing: "score" or "mmr" order for filling the context
+                (default from env CONTEXT_PACKING, else "score")
+            rerank: Re-rank hybrid search candidates with a cross-encoder
+                (default from env HYBRID_RERANK, else off)
         """
         self.collection = get_mongodb_collection(db_name, collection_name)
         self.num_results = num_results
         
+        # Initialize vector search backend
+        self.vector_backend = vector_backend or os.getenv("VECTOR_BACKEND", "atlas")
+        self.vector_store_path = vector_store_path or os.getenv("VECTOR_STORE_PATH")
+        self.vector_index = self._init_vector_index()
+        
+        # Initialize keyword search backend
+        self.keyword_backend = keyword_backend or os.getenv("KEYWORD_BACKEND", "mongo")
+        self.keyword_index = self._init_keyword_index()
+        
         # Initialize Azure OpenAI LLM
         self.llm = self._init_llm()
         
         # Initialize prompt template
         self.prompt_template = self._create_prompt_template()
+        
+        # Initialize answer cache
+        self.answer_cache = self._init_answer_cache(answer_cache)
+        
+        # Expand small or sibling chunk hits to their parent clause/article before answering
+        self.parent_expansion = os.getenv("CHUNK_PARENT_EXPANSION", "1") == "1"
+        self.chunk_min_chars = int(os.getenv("CHUNK_MIN_CHARS", "200"))
+        
+        # Context packing
+        self.context_token_budget = context_token_budget or int(
+            os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_CONTEXT_TOKEN_BUDGET))
+        )
+        self.context_packing = context_packing or os.getenv("CONTEXT_PACKING", "score")
+        
+        # Cross-encoder re-ranking of hybrid search candidates
+        self.rerank = rerank if rerank is not None else os.getenv("HYBRID_RERANK", "0") == "1"
     
-    def _init_llm(self) -> ChatOpenAI:
+    def _init_llm(self) -> "ChatOpenAI":
         """
         Initialize OpenAI LLM from environment variables.
         
@@ -79,6 +232,8 @@ class LegalRAGSystem:
         #     api_key=azure_api_key,  # type: ignore
         #     temperature=0.7
         # )
+        from langchain_openai import ChatOpenAI
+        
         api_key = os.getenv("OPENAI_API_KEY")
         model_name = os.getenv("OPENAI_MODEL_NAME")
         if not api_key:
@@ -87,7 +242,113 @@ class LegalRAGSystem:
             raise ValueError("Missing OpenAI model name. Please set in .env file.")
         return ChatOpenAI(api_key=api_key, model=model_name, temperature=0.7)
     
-    def _create_prompt_template(self) -> ChatPromptTemplate:
+    def warmup(self):
+        """
+        Make the first query fast: load the embedding model and run one
+        encode (and the rerank model, if enabled), and check the MongoDB
+        connection. The LLM client is already created in __init__.
+        
+        Raises:
+            Exception: If the embedding model cannot be loaded or MongoDB cannot be reached
+        """
+        warmup_embedding_model(background=False)
+        if self.rerank:
+            get_reranker().warmup()
+        self.collection.database.client.admin.command("ping")
+    
+    def _init_vector_index(self) -> Optional[LocalVectorIndex]:
+        """
+        Initialize the in-process vector index when the local backend is selected.
+        
+        Returns:
+            LocalVectorIndex for the "local" backend, None for "atlas"
+        """
+        if self.vector_backend == "atlas":
+            return None
+        if self.vector_backend == "local":
+            if self.vector_store_path and os.path.isdir(self.vector_store_path):
+                return LocalVectorIndex.load(self.vector_store_path)
+            if self.vector_store_path:
+                print(f"Vector store not found at {self.vector_store_path}, building index from MongoDB.")
+            return LocalVectorIndex.from_collection(self.collection)
+        raise ValueError(f"Invalid vector backend: {self.vector_backend}. Must be 'atlas' or 'local'")
+    
+    def _init_keyword_index(self) -> Optional[BM25Index]:
+        """
+        Initialize the in-process BM25 index when the bm25 backend is selected.
+        
+        The corpus is taken from the local vector index when there is one,
+        otherwise from a single scan over the MongoDB collection.
+        Env BM25_FOLD_DIACRITICS=1 also matches queries typed without accents.
+        
+        Returns:
+            BM25Index for the "bm25" backend, None for "mongo"
+        """
+        if self.keyword_backend == "mongo":
+            return None
+        if self.keyword_backend == "bm25":
+            fold = os.getenv("BM25_FOLD_DIACRITICS", "0") == "1"
+            if self.vector_index is not None:
+                return BM25Index(self.vector_index.metadata, fold=fold)
+            return BM25Index.from_collection(self.collection, fold=fold)
+        raise ValueError(f"Invalid keyword backend: {self.keyword_backend}. Must be 'mongo' or 'bm25'")
+    
+    def _init_answer_cache(self, answer_cache):
+        """
+        Initialize the cache for generated answers.
+        
+        Configured from environment variables when not given:
+            ANSWER_CACHE_BACKEND: "none", "memory" (default) or "sqlite"
+            ANSWER_CACHE_SIZE: Maximum in-memory entries (default: 512)
+            ANSWER_CACHE_TTL: Entry lifetime in seconds (default: no expiry)
+            ANSWER_CACHE_PATH: SQLite file for the "sqlite" backend
+        
+        Args:
+            answer_cache: Backend name, cache object, or None to read env
+            
+        Returns:
+            Cache object, or None if caching is disabled
+        """
+        if answer_cache is not None and not isinstance(answer_cache, str):
+            return answer_cache
+        
+        backend = answer_cache or os.getenv("ANSWER_CACHE_BACKEND", "memory")
+        ttl = float(os.getenv("ANSWER_CACHE_TTL")) if os.getenv("ANSWER_CACHE_TTL") else None
+        
+        if backend == "none":
+            return None
+        if backend == "memory":
+            return LRUCache(maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "512")), ttl=ttl)
+        if backend == "sqlite":
+            path = os.getenv("ANSWER_CACHE_PATH") or DEFAULT_ANSWER_CACHE_PATH
+            return SQLiteCache(path, table="answers", ttl=ttl)
+        raise ValueError(f"Invalid answer cache backend: {backend}. Must be 'none', 'memory' or 'sqlite'")
+    
+    def _answer_cache_key(self, query: str, context: str) -> str:
+        """
+        Build the answer cache key.
+        
+        The key covers everything that determines the LLM input and sampling:
+        normalized question, a hash of the exact context block sent to the LLM,
+        prompt template version, model name and temperature.
+        """
+        payload = json.dumps([
+            normalize_query(query),
+            hashlib.sha256(context.encode("utf-8")).hexdigest(),
+            PROMPT_TEMPLATE_VERSION,
+            getattr(self.llm, "model_name", ""),
+            getattr(self.llm, "temperature", None),
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def invalidate_answer_cache(self):
+        """
+        Remove all cached answers, e.g. after the corpus is re-ingested.
+        """
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+    
+    def _create_prompt_template(self) -> "ChatPromptTemplate":
         """
         Create prompt template for legal document Q&A.
         
@@ -108,6 +369,8 @@ Câu hỏi: {question}
 Hãy trả lời câu hỏi dựa trên các văn bản pháp luật được cung cấp. Nếu có thể, hãy trích dẫn điều, khoản cụ thể.
 Trả lời:"""
         
+        from langchain_core.prompts import ChatPromptTemplate
+        
         return ChatPromptTemplate.from_template(template)
     
     def keyword_search(
@@ -116,7 +379,7 @@ Trả lời:"""
         limit: Optional[int] = None
     ) -> List[Dict]:
         """
-        Perform keyword-based search using MongoDB text search.
+        Perform keyword-based search using MongoDB text search or the BM25 index.
         
         Args:
             query: Search query
@@ -127,42 +390,104 @@ Trả lời:"""
         """
         limit = limit or self.num_results
         
+        if self.keyword_index is not None:
+            return [self._format_result(result, "keyword") for result in self.keyword_index.search(query, limit)]
+        
         # MongoDB text search (requires text index on 'noi_dung' field)
-        # If text index doesn't exist, fall back to regex search
+        # If text index doesn't exist, fall back to the token index
         try:
             results = list(
                 self.collection.find(
-                    {"$text": {"$search": query}},
+                    {"$text": {"$search": query}, **SEARCHABLE_FILTER},
                     {"score": {"$meta": "textScore"}}
                 ).sort([("score", {"$meta": "textScore"})]).limit(limit)
             )
-        except Exception:
-            # Fallback to regex search if text index doesn't exist
-            results = list(
-                self.collection.find(
-                    {
-                        "$or": [
-                            {"tieu_de": {"$regex": query, "$options": "i"}},
-                            {"noi_dung": {"$regex": query, "$options": "i"}},
-                            {"loai_heading": {"$regex": query, "$options": "i"}}
-                        ]
-                    }
-                ).limit(limit)
-            )
+        except OperationFailure as e:
+            print(f"Text search unavailable ({e.code}), using token index.")
+            results = self._token_search(query, limit)
+        
+        return [self._format_result(result, "keyword") for result in results]
+    
+    @staticmethod
+    def _format_result(result: Dict, search_type: str) -> Dict:
+        """
+        Format a raw hit from any search backend as a search result.
+        
+        Every result carries a `chunk_id`; chunked corpora also carry
+        `parent_id`, `article_id` and `level`.
+        """
+        formatted = {
+            "chunk_id": result.get("id") or make_chunk_id(result),
+            "van_ban": result.get("van_ban", ""),
+            "tieu_de": result.get("tieu_de", ""),
+            "loai_heading": result.get("loai_heading", ""),
+            "noi_dung": result.get("noi_dung", ""),
+            "score": result.get("score", 0.0),
+            "search_type": search_type
+        }
+        for field in CHUNK_FIELDS:
+            if result.get(field):
+                formatted[field] = result[field]
+        return formatted
+    
+    def _token_search(self, query: str, limit: int) -> List[Dict]:
+        """
+        Keyword search over the precomputed `tokens` array field.
+        
+        Candidates come from a multikey index lookup with $in (the query is
+        never used as a pattern, and the index is hinted so a missing index
+        fails instead of scanning the collection). The server ranks them by
+        the weighted number of query terms they contain (bigrams count double)
+        and returns only the best TOKEN_SEARCH_CANDIDATES; title matches then
+        break ties here.
+        Build the field with: python -m libs.create_embeddings --keyword-tokens
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results
+            
+        Returns:
+            List of documents with a `score` in [0, 1], best first
+        """
+        query_syllables = tokenize(query, bigrams=False)
+        bigrams = list(dict.fromkeys(tokenize(query)[len(query_syllables):]))[:TOKEN_SEARCH_MAX_TERMS]
+        syllables = list(dict.fromkeys(query_syllables))[:TOKEN_SEARCH_MAX_TERMS]
+        if not syllables:
+            return []
+        
+        # Bigrams are far more selective, so use them to fetch candidates when the query has any
+        lookup_terms = bigrams or syllables
+        match_weight = {"$add": [
+            {"$size": {"$setIntersection": [f"${TOKENS_FIELD}", syllables]}},
+            {"$multiply": [2, {"$size": {"$setIntersection": [f"${TOKENS_FIELD}", bigrams]}}]},
+        ]}
+        projection = {"_id": 0, "van_ban": 1, "tieu_de": 1, "loai_heading": 1, "noi_dung": 1, "chunk_id": 1, "match_weight": 1}
+        projection.update({field: 1 for field in CHUNK_FIELDS})
+        pipeline = [
+            {"$match": {TOKENS_FIELD: {"$in": lookup_terms}, **SEARCHABLE_FILTER}},
+            {"$addFields": {"match_weight": match_weight}},
+            {"$sort": {"match_weight": -1}},
+            {"$limit": TOKEN_SEARCH_CANDIDATES},
+            {"$project": projection},
+        ]
+        try:
+            candidates = list(self.collection.aggregate(pipeline, hint=[(TOKENS_FIELD, 1)]))
+        except OperationFailure as e:
+            print(f"Error in token search (is the '{TOKENS_FIELD}' index built?): {e}")
+            return []
         
-        # Format results
-        formatted_results = []
-        for result in results:
-            formatted_results.append({
-                "van_ban": result.get("van_ban", ""),
-                "tieu_de": result.get("tieu_de", ""),
-                "loai_heading": result.get("loai_heading", ""),
-                "noi_dung": result.get("noi_dung", ""),
-                "score": result.get("score", 0.0),
-                "search_type": "keyword"
-            })
+        # Score: share of query terms in the document, with title matches breaking ties
+        weights = dict.fromkeys(syllables, 1.0)
+        weights.update(dict.fromkeys(bigrams, 2.0))
+        total_weight = sum(weights.values())
+        for doc in candidates:
+            title_terms = set(tokenize(doc.get("tieu_de", "")))
+            coverage = doc.pop("match_weight", 0) / total_weight
+            title_coverage = sum(weight for term, weight in weights.items() if term in title_terms) / total_weight
+            doc["score"] = 0.75 * coverage + 0.25 * title_coverage
         
-        return formatted_results
+        candidates.sort(key=lambda doc: doc["score"], reverse=True)
+        return candidates[:limit]
     
     def semantic_search(
         self,
@@ -186,6 +511,50 @@ Trả lời:"""
         if query_embedding is None:
             return []
         
+        return self._search_by_embedding(query_embedding, limit)
+    
+    def _search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int
+    ) -> List[Dict]:
+        """
+        Run vector search for a query embedding on the configured backend.
+        
+        Args:
+            query_embedding: Query vector
+            limit: Maximum number of results
+            
+        Returns:
+            List of search results with metadata
+        """
+        if self.vector_index is not None:
+            try:
+                results = self.vector_index.search(query_embedding, limit)
+            except Exception as e:
+                # e.g. query dimension does not match the index; same handling as the Atlas path
+                print(f"Error in vector search: {e}")
+                return []
+        else:
+            results = self._atlas_vector_search(query_embedding, limit)
+        
+        return [self._format_result(result, "semantic") for result in results]
+    
+    def _atlas_vector_search(
+        self,
+        query_embedding: List[float],
+        limit: int
+    ) -> List[Dict]:
+        """
+        Run vector search on MongoDB Atlas using $vectorSearch.
+        
+        Args:
+            query_embedding: Query vector
+            limit: Maximum number of results
+            
+        Returns:
+            List of raw result documents with vectorSearchScore as score
+        """
         # MongoDB vector search pipeline
         # Syntax theo MongoDB documentation:
         # https://www.mongodb.com/docs/atlas/atlas-vector-search/vector-search-stage/
@@ -210,6 +579,8 @@ Trả lời:"""
                 "tieu_de": 1,
                 "loai_heading": 1,
                 "noi_dung": 1,
+                "chunk_id": 1,
+                **{field: 1 for field in CHUNK_FIELDS},
                 "score": {"$meta": "vectorSearchScore"}
             }
         }
@@ -217,109 +588,99 @@ Trả lời:"""
         pipeline = [vector_search_stage, unset_stage, project_stage]
         
         try:
-            results = list(self.collection.aggregate(pipeline))
+            return list(self.collection.aggregate(pipeline))
         except Exception as e:
             print(f"Error in vector search: {e}")
             print("Make sure vector index 'vector_index' exists in MongoDB.")
             return []
-        
-        # Format results
-        formatted_results = []
-        for result in results:
-            formatted_results.append({
-                "van_ban": result.get("van_ban", ""),
-                "tieu_de": result.get("tieu_de", ""),
-                "loai_heading": result.get("loai_heading", ""),
-                "noi_dung": result.get("noi_dung", ""),
-                "score": result.get("score", 0.0),
-                "search_type": "semantic"
-            })
-        
-        return formatted_results
     
     def hybrid_search(
         self,
         query: str,
         limit: Optional[int] = None,
         keyword_weight: float = 0.3,
-        semantic_weight: float = 0.7
+        semantic_weight: float = 0.7,
+        leg_timeout: Optional[float] = None,
+        fusion: Optional[FusionStrategy] = None,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[bool] = None
     ) -> List[Dict]:
         """
         Perform hybrid search combining keyword and semantic search.
         
+        Both searches run concurrently. If one of them fails or exceeds
+        `leg_timeout`, the results of the other one are still returned.
+        
         Args:
             query: Search query
             limit: Maximum number of results (default: self.num_results)
             keyword_weight: Weight for keyword search scores (default: 0.3)
             semantic_weight: Weight for semantic search scores (default: 0.7)
+            leg_timeout: Seconds to wait for each search (default from env
+                HYBRID_LEG_TIMEOUT, no timeout if unset)
+            fusion: Score fusion strategy - "weighted", "rrf", "minmax" or "zscore"
+                (default from env HYBRID_FUSION, else "weighted")
+            num_candidates: Candidates fetched from each search (default from env
+                HYBRID_CANDIDATES, else limit * 2, at least RERANK_TOP_M when re-ranking)
+            rerank: Re-rank the top RERANK_TOP_M (default 20) fused candidates with
+                a cross-encoder and keep the best `limit` (default: self.rerank).
+                Skipped, keeping the fused order, when it would exceed the
+                latency budget (env RERANK_LATENCY_BUDGET_MS)
             
         Returns:
-            List of search results with combined scores
+            List of search results with combined scores and the fusion strategy used
         """
         limit = limit or self.num_results
+        fusion = fusion or os.getenv("HYBRID_FUSION", "weighted")
+        rerank = self.rerank if rerank is None else rerank
+        fuse_limit = max(limit, int(os.getenv("RERANK_TOP_M", str(DEFAULT_RERANK_TOP_M)))) if rerank else limit
+        num_candidates = num_candidates or int(os.getenv("HYBRID_CANDIDATES", "0")) or max(limit * 2, fuse_limit)
+        if leg_timeout is None and os.getenv("HYBRID_LEG_TIMEOUT"):
+            leg_timeout = float(os.getenv("HYBRID_LEG_TIMEOUT"))
         
-        # Perform both searches
-        keyword_results = self.keyword_search(query, limit * 2)
-        semantic_results = self.semantic_search(query, limit * 2)
-        
-        # Create a dictionary to combine results
-        combined_results = {}
-        
-        # Process keyword results
-        for result in keyword_results:
-            key = f"{result['van_ban']}_{result['tieu_de']}"
-            if key not in combined_results:
-                combined_results[key] = result.copy()
-                # Normalize keyword score (assuming max score ~1.0)
-                combined_results[key]['keyword_score'] = min(result.get('score', 0.0), 1.0)
-                combined_results[key]['semantic_score'] = 0.0
-            else:
-                combined_results[key]['keyword_score'] = max(
-                    combined_results[key].get('keyword_score', 0.0),
-                    min(result.get('score', 0.0), 1.0)
-                )
-        
-        # Process semantic results
-        for result in semantic_results:
-            key = f"{result['van_ban']}_{result['tieu_de']}"
-            if key not in combined_results:
-                combined_results[key] = result.copy()
-                combined_results[key]['keyword_score'] = 0.0
-                combined_results[key]['semantic_score'] = result.get('score', 0.0)
-            else:
-                combined_results[key]['semantic_score'] = max(
-                    combined_results[key].get('semantic_score', 0.0),
-                    result.get('score', 0.0)
-                )
-        
-        # Calculate combined scores
-        for key, result in combined_results.items():
-            combined_score = (
-                keyword_weight * result.get('keyword_score', 0.0) +
-                semantic_weight * result.get('semantic_score', 0.0)
-            )
-            result['score'] = combined_score
-            result['search_type'] = 'hybrid'
-        
-        # Sort by combined score and return top results
-        sorted_results = sorted(
-            combined_results.values(),
-            key=lambda x: x['score'],
-            reverse=True
-        )
+        # Perform both searches concurrently
+        executor = _get_search_executor()
+        deadline = time.monotonic() + leg_timeout if leg_timeout is not None else None
+        keyword_future = executor.submit(self.keyword_search, query, num_candidates)
+        semantic_future = executor.submit(self.semantic_search, query, num_candidates)
         
-        # Remove duplicates based on document ID to ensure unique results
-        seen_keys = set()
-        unique_results = []
-        for result in sorted_results:
-            key = f"{result.get('van_ban', '')}_{result.get('tieu_de', '')}"
-            if key not in seen_keys:
-                seen_keys.add(key)
-                unique_results.append(result)
-                if len(unique_results) >= limit:
-                    break
+        keyword_results = self._collect_leg("keyword", keyword_future, deadline)
+        semantic_results = self._collect_leg("semantic", semantic_future, deadline)
         
-        return unique_results
+        results = fuse_results(
+            keyword_results,
+            semantic_results,
+            fuse_limit,
+            strategy=fusion,
+            keyword_weight=keyword_weight,
+            semantic_weight=semantic_weight
+        )
+        if rerank:
+            results = get_reranker().rerank(query, results, limit)
+        return results
+    
+    @staticmethod
+    def _collect_leg(name: str, future, deadline: Optional[float]) -> List[Dict]:
+        """
+        Wait for one hybrid search leg, returning no results on failure or timeout.
+        
+        Args:
+            name: Leg name for log messages
+            future: Future running the search
+            deadline: time.monotonic() deadline, or None to wait indefinitely
+            
+        Returns:
+            Search results of the leg
+        """
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The search keeps running in the pool; its result is discarded
+            print(f"Warning: {name} search timed out, continuing without it.")
+        except Exception as e:
+            print(f"Error in {name} search: {e}")
+        return []
     
     def search(
         self,
@@ -347,12 +708,189 @@ Trả lời:"""
         else:
             raise ValueError(f"Invalid search mode: {mode}. Must be 'keyword', 'semantic', or 'hybrid'")
     
+    def _fetch_parents(self, parent_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Load parent chunks by chunk id.
+        """
+        projection = {"_id": 0, "chunk_id": 1, "van_ban": 1, "tieu_de": 1, "loai_heading": 1, "noi_dung": 1}
+        projection.update({field: 1 for field in CHUNK_FIELDS})
+        cursor = self.collection.find({"chunk_id": {"$in": parent_ids}}, projection)
+        return {doc["chunk_id"]: doc for doc in cursor}
+    
+    def expand_parents(self, search_results: List[Dict]) -> List[Dict]:
+        """
+        Replace chunk hits that carry too little context with their parent.
+        
+        Applies to chunked corpora (see libs/chunking.py): hits shorter than
+        CHUNK_MIN_CHARS, or several hits from the same clause/article, are
+        replaced by the parent text. Disable with env CHUNK_PARENT_EXPANSION=0.
+        
+        Args:
+            search_results: Search results, best first
+            
+        Returns:
+            Search results with expanded parents
+        """
+        if not self.parent_expansion:
+            return search_results
+        try:
+            return expand_to_parents(search_results, self._fetch_parents, self.chunk_min_chars)
+        except Exception as e:
+            print(f"Error expanding chunks to parents: {e}")
+            return search_results
+    
+    def _pack_context(self, search_results: List[Dict]) -> List[Dict]:
+        """
+        Select and trim search results to the context token budget.
+        
+        Args:
+            search_results: Search results
+            
+        Returns:
+            Packed results in context order, with `context_text` and `context_tokens`
+        """
+        return pack_context(search_results, self.context_token_budget, self.context_packing)
+    
+    def _build_context(self, packed_results: List[Dict]) -> str:
+        """
+        Format packed search results into the context block of the prompt.
+        
+        Args:
+            packed_results: Output of _pack_context
+            
+        Returns:
+            Context string
+        """
+        return format_context(packed_results)
+    
+    @staticmethod
+    def _format_sources(search_results: List[Dict], mode: SearchMode) -> List[Dict]:
+        """
+        Format search results as answer sources.
+        
+        Args:
+            search_results: Search results
+            mode: Search mode used to retrieve them
+            
+        Returns:
+            List of source dicts
+        """
+        return [
+            {
+                "chunk_id": r.get("chunk_id") or make_chunk_id(r),
+                "van_ban": r.get("van_ban", ""),
+                "tieu_de": r.get("tieu_de", ""),
+                "loai_heading": r.get("loai_heading", ""),
+                "noi_dung": r.get("noi_dung", ""),  # Thêm noi_dung vào sources
+                "score": r.get("score", 0.0),
+                "search_type": r.get("search_type", mode),
+                "context_tokens": r.get("context_tokens", 0)
+            }
+            for r in search_results
+        ]
+    
+    def _remember(self, memory: Optional[ConversationMemory], query: str, answer: str):
+        """
+        Record a turn in the conversation memory, summarizing older turns with the LLM.
+        """
+        if memory is not None:
+            memory.add_turn(query, answer, self.llm)
+    
+    def _prepare_answer(self, question: str, search_results: List[Dict]) -> tuple:
+        """
+        Pack search results into the prompt context and look up a cached answer.
+        
+        Args:
+            question: Standalone question sent to the LLM
+            search_results: Search results to answer from
+            
+        Returns:
+            (packed results, context string, cache key, cached answer); the
+            context is None when nothing was packed, the key is None when
+            caching is off, and the answer is None on a cache miss
+        """
+        packed = self._pack_context(search_results)
+        if not packed:
+            return packed, None, None, None
+        
+        context = self._build_context(packed)
+        
+        # Reuse the answer for the same question over the same context
+        cache_key = None
+        answer = None
+        if self.answer_cache is not None:
+            cache_key = self._answer_cache_key(question, context)
+            answer = self.answer_cache.get(cache_key)
+        return packed, context, cache_key, answer
+    
+    def _store_answer(self, cache_key: Optional[str], answer: str):
+        """
+        Cache a generated answer under the key from _prepare_answer.
+        """
+        if cache_key is not None:
+            self.answer_cache.set(cache_key, answer)
+    
+    def _answer_messages(self, context: str, question: str) -> list:
+        """
+        Build the LLM messages for a question over a packed context.
+        """
+        return self.prompt_template.format_messages(
+            context=context,
+            question=question
+        )
+    
+    def _answer_result(
+        self,
+        query: str,
+        question: str,
+        packed_results: List[Dict],
+        answer: str,
+        mode: SearchMode
+    ) -> Dict:
+        """
+        Format the result of generate_answer.
+        """
+        if not packed_results:
+            return {
+                "answer": answer,
+                "sources": [],
+                "query": query,
+                "standalone_query": question
+            }
+        return {
+            "answer": answer,
+            "sources": self._format_sources(packed_results, mode),
+            "query": query,
+            "standalone_query": question,
+            "search_mode": mode
+        }
+    
+    def _sources_event(self, query: str, question: str, packed_results: List[Dict], mode: SearchMode) -> Dict:
+        """
+        Format the "sources" event that opens an answer stream.
+        """
+        return {
+            "type": "sources",
+            "sources": self._format_sources(packed_results, mode),
+            "query": query,
+            "standalone_query": question,
+            "search_mode": mode
+        }
+    
+    @staticmethod
+    def _error_answer(answer_parts: List[str]) -> str:
+        """
+        Error text sent after a failed (possibly partial) streamed answer.
+        """
+        return "\n\n" + ERROR_ANSWER if answer_parts else ERROR_ANSWER
+    
     def generate_answer(
         self,
         query: str,
         search_results: Optional[List[Dict]] = None,
         mode: SearchMode = "semantic",
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
     ) -> Dict:
         """
         Generate answer using RAG (Retrieval-Augmented Generation).
@@ -362,69 +900,298 @@ Trả lời:"""
             search_results: Pre-computed search results (optional)
             mode: Search mode if search_results not provided
             limit: Number of results to retrieve if search_results not provided
+            memory: Conversation memory; follow-up questions are rewritten into a
+                standalone query for retrieval and the new turn is recorded
             
         Returns:
             Dictionary with answer and sources
         """
+        question = memory.rewrite_query(query, self.llm) if memory is not None else query
+        
         # Get search results if not provided
         if search_results is None:
-            search_results = self.search(query, mode=mode, limit=limit or self.num_results)
+            search_results = self.expand_parents(self.search(question, mode=mode, limit=limit or self.num_results))
+        packed, context, cache_key, answer = self._prepare_answer(question, search_results)
         
-        if not search_results:
-            return {
-                "answer": "Xin lỗi, tôi không tìm thấy thông tin liên quan đến câu hỏi của bạn trong cơ sở dữ liệu.",
-                "sources": [],
-                "query": query
-            }
+        if context is None:
+            answer = NO_RESULTS_ANSWER
+        elif answer is None:
+            # Generate answer using LLM
+            try:
+                response = self.llm.invoke(self._answer_messages(context, question))
+                answer = response.content
+                self._store_answer(cache_key, answer)
+            except Exception as e:
+                print(f"Error generating answer: {e}")
+                answer = ERROR_ANSWER
+        
+        if answer != ERROR_ANSWER:
+            self._remember(memory, query, answer)
         
-        # Format context from search results
-        context_parts = []
-        for i, result in enumerate(search_results, 1):
-            context_part = f"[{i}] {result.get('tieu_de', '')}\n"
-            context_part += f"Văn bản: {result.get('van_ban', '')}\n"
-            context_part += f"Nội dung: {result.get('noi_dung', '')[:500]}..."  # Limit content length
-            context_parts.append(context_part)
+        return self._answer_result(query, question, packed, answer, mode)
+    
+    def generate_answer_stream(
+        self,
+        query: str,
+        search_results: Optional[List[Dict]] = None,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> Iterator[Dict]:
+        """
+        Generate answer using RAG, streaming the LLM output as it is produced.
         
-        context = "\n\n".join(context_parts)
+        Yields events in this order:
+            {"type": "sources", "sources": [...], "query": ..., "search_mode": ...}
+            {"type": "token", "content": "..."}  (one per chunk from the LLM)
+            {"type": "done", "answer": "..."}  (full answer text)
         
-        # Generate answer using LLM
+        Args:
+            query: User question
+            search_results: Pre-computed search results (optional)
+            mode: Search mode if search_results not provided
+            limit: Number of results to retrieve if search_results not provided
+            memory: Conversation memory (see generate_answer)
+            
+        Yields:
+            Event dictionaries
+        """
+        question = memory.rewrite_query(query, self.llm) if memory is not None else query
+        
+        # Get search results if not provided
+        if search_results is None:
+            search_results = self.expand_parents(self.search(question, mode=mode, limit=limit or self.num_results))
+        packed, context, cache_key, answer = self._prepare_answer(question, search_results)
+        
+        yield self._sources_event(query, question, packed, mode)
+        
+        # No results and cached answers are sent as a single chunk
+        if context is None or answer is not None:
+            answer = NO_RESULTS_ANSWER if context is None else answer
+            self._remember(memory, query, answer)
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", "answer": answer}
+            return
+        
+        # Stream answer from LLM
+        answer_parts = []
         try:
-            messages = self.prompt_template.format_messages(
-                context=context,
-                question=query
-            )
-            response = self.llm.invoke(messages)
-            answer = response.content
+            for chunk in self.llm.stream(self._answer_messages(context, question)):
+                if chunk.content:
+                    answer_parts.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            answer = "".join(answer_parts)
+            self._store_answer(cache_key, answer)
+            self._remember(memory, query, answer)
         except Exception as e:
             print(f"Error generating answer: {e}")
-            answer = "Xin lỗi, có lỗi xảy ra khi tạo câu trả lời. Vui lòng thử lại."
+            error_message = self._error_answer(answer_parts)
+            yield {"type": "token", "content": error_message}
+            answer = "".join(answer_parts) + error_message
         
-        # Format sources
-        sources = [
-            {
-                "van_ban": r.get("van_ban", ""),
-                "tieu_de": r.get("tieu_de", ""),
-                "loai_heading": r.get("loai_heading", ""),
-                "noi_dung": r.get("noi_dung", ""),  # Thêm noi_dung vào sources
-                "score": r.get("score", 0.0),
-                "search_type": r.get("search_type", mode)
-            }
-            for r in search_results
-        ]
+        yield {"type": "done", "answer": answer}
+
+    
+    # Async API
+    
+    async def akeyword_search(
+        self,
+        query: str,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Async version of keyword_search (MongoDB query runs in a worker thread).
+        """
+        return await asyncio.to_thread(self.keyword_search, query, limit)
+    
+    async def asemantic_search(
+        self,
+        query: str,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Async version of semantic_search.
         
-        return {
-            "answer": answer,
-            "sources": sources,
-            "query": query,
-            "search_mode": mode
-        }
+        The query is embedded on the bounded embedding pool and the vector
+        search runs in a worker thread.
+        """
+        limit = limit or self.num_results
+        
+        loop = asyncio.get_running_loop()
+        query_embedding = await loop.run_in_executor(_get_embedding_executor(), get_embedding, query)
+        if query_embedding is None:
+            return []
+        
+        return await asyncio.to_thread(self._search_by_embedding, query_embedding, limit)
+    
+    async def ahybrid_search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        keyword_weight: float = 0.3,
+        semantic_weight: float = 0.7,
+        leg_timeout: Optional[float] = None,
+        fusion: Optional[FusionStrategy] = None,
+        num_candidates: Optional[int] = None,
+        rerank: Optional[bool] = None
+    ) -> List[Dict]:
+        """
+        Async version of hybrid_search. Both legs run concurrently on the event loop.
+        """
+        limit = limit or self.num_results
+        fusion = fusion or os.getenv("HYBRID_FUSION", "weighted")
+        rerank = self.rerank if rerank is None else rerank
+        fuse_limit = max(limit, int(os.getenv("RERANK_TOP_M", str(DEFAULT_RERANK_TOP_M)))) if rerank else limit
+        num_candidates = num_candidates or int(os.getenv("HYBRID_CANDIDATES", "0")) or max(limit * 2, fuse_limit)
+        if leg_timeout is None and os.getenv("HYBRID_LEG_TIMEOUT"):
+            leg_timeout = float(os.getenv("HYBRID_LEG_TIMEOUT"))
+        
+        keyword_results, semantic_results = await asyncio.gather(
+            self._acollect_leg("keyword", self.akeyword_search(query, num_candidates), leg_timeout),
+            self._acollect_leg("semantic", self.asemantic_search(query, num_candidates), leg_timeout)
+        )
+        
+        results = fuse_results(
+            keyword_results,
+            semantic_results,
+            fuse_limit,
+            strategy=fusion,
+            keyword_weight=keyword_weight,
+            semantic_weight=semantic_weight
+        )
+        if rerank:
+            # Scoring is CPU-bound model inference, like query embedding
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(_get_embedding_executor(), get_reranker().rerank, query, results, limit)
+        return results
+    
+    @staticmethod
+    async def _acollect_leg(name: str, coroutine, timeout: Optional[float]) -> List[Dict]:
+        """
+        Await one hybrid search leg, returning no results on failure or timeout.
+        """
+        try:
+            return await asyncio.wait_for(coroutine, timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: {name} search timed out, continuing without it.")
+        except Exception as e:
+            print(f"Error in {name} search: {e}")
+        return []
+    
+    async def asearch(
+        self,
+        query: str,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Async version of search.
+        """
+        if mode == "keyword":
+            return await self.akeyword_search(query, limit)
+        elif mode == "semantic":
+            return await self.asemantic_search(query, limit)
+        elif mode == "hybrid":
+            return await self.ahybrid_search(query, limit)
+        else:
+            raise ValueError(f"Invalid search mode: {mode}. Must be 'keyword', 'semantic', or 'hybrid'")
+    
+    async def agenerate_answer(
+        self,
+        query: str,
+        search_results: Optional[List[Dict]] = None,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> Dict:
+        """
+        Async version of generate_answer (uses the LLM's ainvoke).
+        """
+        question = await memory.arewrite_query(query, self.llm) if memory is not None else query
+        
+        # Get search results if not provided
+        if search_results is None:
+            search_results = await self.asearch(question, mode=mode, limit=limit or self.num_results)
+            search_results = await asyncio.to_thread(self.expand_parents, search_results)
+        # Token counting and the cache lookup (SQLite) run off the event loop
+        packed, context, cache_key, answer = await asyncio.to_thread(self._prepare_answer, question, search_results)
+        
+        if context is None:
+            answer = NO_RESULTS_ANSWER
+        elif answer is None:
+            # Generate answer using LLM
+            try:
+                response = await self.llm.ainvoke(self._answer_messages(context, question))
+                answer = response.content
+                await asyncio.to_thread(self._store_answer, cache_key, answer)
+            except Exception as e:
+                print(f"Error generating answer: {e}")
+                answer = ERROR_ANSWER
+        
+        if answer != ERROR_ANSWER:
+            await asyncio.to_thread(self._remember, memory, query, answer)
+        
+        return self._answer_result(query, question, packed, answer, mode)
+    
+    async def agenerate_answer_stream(
+        self,
+        query: str,
+        search_results: Optional[List[Dict]] = None,
+        mode: SearchMode = "semantic",
+        limit: Optional[int] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Async version of generate_answer_stream (uses the LLM's astream).
+        
+        Yields the same events: "sources", then "token" chunks, then "done".
+        """
+        question = await memory.arewrite_query(query, self.llm) if memory is not None else query
+        
+        # Get search results if not provided
+        if search_results is None:
+            search_results = await self.asearch(question, mode=mode, limit=limit or self.num_results)
+            search_results = await asyncio.to_thread(self.expand_parents, search_results)
+        # Token counting and the cache lookup (SQLite) run off the event loop
+        packed, context, cache_key, answer = await asyncio.to_thread(self._prepare_answer, question, search_results)
+        
+        yield self._sources_event(query, question, packed, mode)
+        
+        # No results and cached answers are sent as a single chunk
+        if context is None or answer is not None:
+            answer = NO_RESULTS_ANSWER if context is None else answer
+            await asyncio.to_thread(self._remember, memory, query, answer)
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", "answer": answer}
+            return
+        
+        # Stream answer from LLM
+        answer_parts = []
+        try:
+            async for chunk in self.llm.astream(self._answer_messages(context, question)):
+                if chunk.content:
+                    answer_parts.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            answer = "".join(answer_parts)
+            await asyncio.to_thread(self._store_answer, cache_key, answer)
+            await asyncio.to_thread(self._remember, memory, query, answer)
+        except Exception as e:
+            print(f"Error generating answer: {e}")
+            error_message = self._error_answer(answer_parts)
+            yield {"type": "token", "content": error_message}
+            answer = "".join(answer_parts) + error_message
+        
+        yield {"type": "done", "answer": answer}
 
 
 # Convenience functions for easy import
 def create_rag_system(
     db_name: Optional[str] = None,
     collection_name: Optional[str] = None,
-    num_results: int = 5
+    num_results: int = 5,
+    vector_backend: Optional[VectorBackend] = None,
+    vector_store_path: Optional[str] = None,
+    keyword_backend: Optional[KeywordBackend] = None
 ) -> LegalRAGSystem:
     """
     Create and return a LegalRAGSystem instance.
@@ -433,11 +1200,92 @@ def create_rag_system(
         db_name: MongoDB database name
         collection_name: MongoDB collection name
         num_results: Default number of results
+        vector_backend: "atlas" or "local" (default from env VECTOR_BACKEND)
+        vector_store_path: On-disk embedding store (default from env VECTOR_STORE_PATH)
+        keyword_backend: "mongo" or "bm25" (default from env KEYWORD_BACKEND)
         
     Returns:
         LegalRAGSystem instance
     """
-    return LegalRAGSystem(db_name, collection_name, num_results)
+    return LegalRAGSystem(
+        db_name,
+        collection_name,
+        num_results,
+        vector_backend,
+        vector_store_path,
+        keyword_backend=keyword_backend
+    )
+
+
+def get_shared_rag_system(
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    num_results: int = 5
+) -> LegalRAGSystem:
+    """
+    Get a cached LegalRAGSystem, creating it on first use.
+    
+    Systems are shared per (db_name, collection_name, num_results), with names
+    resolved from env when not given, so repeated calls reuse the same MongoDB
+    client, LLM client and prompt template. A system is built outside the
+    shared lock; concurrent callers for the same key wait for one build.
+    
+    Args:
+        db_name: MongoDB database name
+        collection_name: MongoDB collection name
+        num_results: Default number of results
+        
+    Returns:
+        LegalRAGSystem instance
+    """
+    db_name, collection_name = resolve_collection_names(db_name, collection_name)
+    key = (db_name, collection_name, num_results)
+    
+    with _rag_systems_lock:
+        rag = _rag_systems.get(key)
+        if rag is not None:
+            return rag
+        build_lock = _rag_system_build_locks.setdefault(key, threading.Lock())
+    
+    with build_lock:
+        with _rag_systems_lock:
+            rag = _rag_systems.get(key)
+            generation = _rag_systems_generation
+        if rag is None:
+            rag = LegalRAGSystem(db_name, collection_name, num_results)
+            with _rag_systems_lock:
+                if generation == _rag_systems_generation:
+                    _rag_systems[key] = rag
+    
+    return rag
+
+
+def invalidate_rag_systems(
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None
+):
+    """
+    Drop cached systems so the next call rebuilds them.
+    
+    Call after re-ingesting data or changing configuration. Without arguments
+    all cached systems are dropped; otherwise only those matching the given
+    database and/or collection name.
+    
+    Args:
+        db_name: Only drop systems for this database name
+        collection_name: Only drop systems for this collection name
+    """
+    global _rag_systems_generation
+    
+    with _rag_systems_lock:
+        _rag_systems_generation += 1
+        for key in list(_rag_systems):
+            key_db_name, key_collection_name, _ = key
+            if db_name is not None and key_db_name != db_name:
+                continue
+            if collection_name is not None and key_collection_name != collection_name:
+                continue
+            del _rag_systems[key]
 
 
 def search_legal_documents(
@@ -460,7 +1308,7 @@ def search_legal_documents(
     Returns:
         List of search results
     """
-    rag = LegalRAGSystem(db_name, collection_name, limit)
+    rag = get_shared_rag_system(db_name, collection_name, limit)
     return rag.search(query, mode, limit)
 
 
@@ -484,6 +1332,6 @@ def ask_legal_question(
     Returns:
         Dictionary with answer and sources
     """
-    rag = LegalRAGSystem(db_name, collection_name, limit)
+    rag = get_shared_rag_system(db_name, collection_name, limit)
     return rag.generate_answer(question, mode=mode, limit=limit)
 
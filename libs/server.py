@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP service for the RAG system
+Keeps one LegalRAGSystem (embedding model, MongoDB client, LLM client) per process
+and serves it to thin clients such as the Streamlit app.
+
+Endpoints:
+    GET  /health  -> {"status": "ok", ...}
+    POST /search  {"query": ..., "mode": ..., "limit": ...} -> {"results": [...]}
+    POST /answer  {"query": ..., "mode": ..., "limit": ..., "memory": ...} -> Server-Sent Events
+                  ("sources", "token" and "done", same payloads as generate_answer_stream,
+                  plus a final "memory" event with the updated memory if one was sent)
+
+Run: python -m libs.server --port 8000
+"""
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from .search import LegalRAGSystem
+from .memory import ConversationMemory
+from .utils import enable_embedding_batcher
+
+# Load environment variables
+load_dotenv()
+
+# Largest accepted request body
+MAX_BODY_BYTES = 64 * 1024
+
+
+class RAGServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server with request-level admission control.
+
+    At most `max_concurrency` requests run at a time; up to `max_queue` more
+    wait for a slot (for at most `queue_timeout` seconds). Anything beyond
+    that is rejected with 503 instead of piling up threads.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        rag_system: LegalRAGSystem,
+        max_concurrency: int = 4,
+        max_queue: int = 16,
+        queue_timeout: float = 30.0
+    ):
+        super().__init__(address, RAGRequestHandler)
+        self.rag_system = rag_system
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._state_lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire_slot(self) -> bool:
+        """
+        Wait for a free request slot.
+
+        Returns:
+            True if a slot was acquired, False if the queue is full or the wait timed out
+        """
+        # Take a free slot right away without counting as waiting
+        if self._slots.acquire(blocking=False):
+            with self._state_lock:
+                self.active += 1
+            return True
+
+        with self._state_lock:
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+
+        with self._state_lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+        return acquired
+
+    def release_slot(self):
+        with self._state_lock:
+            self.active -= 1
+        self._slots.release()
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for /health, /search and /answer.
+    """
+
+    server: RAGServer
+    headers_sent = False
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        self._send_json(200, {
+            "status": "ok",
+            "active": self.server.active,
+            "waiting": self.server.waiting,
+            "max_concurrency": self.server.max_concurrency,
+            "max_queue": self.server.max_queue,
+        })
+
+    def do_POST(self):
+        if self.path not in ("/search", "/answer"):
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        body = self._read_json()
+        if body is None:
+            return
+
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            self._send_json(400, {"error": "Field 'query' is required"})
+            return
+        mode = body.get("mode", "semantic")
+        if mode not in ("keyword", "semantic", "hybrid"):
+            self._send_json(400, {"error": "Field 'mode' must be 'keyword', 'semantic' or 'hybrid'"})
+            return
+        limit = body.get("limit")
+        if limit is not None and (not isinstance(limit, int) or limit <= 0):
+            self._send_json(400, {"error": "Field 'limit' must be a positive integer"})
+            return
+        memory = body.get("memory")
+        if memory is not None:
+            if not _is_valid_memory(memory):
+                self._send_json(400, {
+                    "error": "Field 'memory' must be an object with a string 'summary' and a 'turns' list "
+                             "of objects with string 'question' and 'answer'"
+                })
+                return
+            # Built before any response is sent, so bad input cannot fail mid-stream
+            memory = ConversationMemory.from_dict(memory)
+
+        if not self.server.acquire_slot():
+            self._send_json(503, {"error": "Server busy, please retry"}, {"Retry-After": "1"})
+            return
+
+        try:
+            if self.path == "/search":
+                results = self.server.rag_system.search(query, mode=mode, limit=limit)
+                self._send_json(200, {"results": results})
+            else:
+                self._stream_answer(query, mode, limit, memory)
+        except Exception as e:
+            print(f"Error handling {self.path}: {e}")
+            if not self.headers_sent:
+                self._send_json(500, {"error": "Internal server error"})
+        finally:
+            self.server.release_slot()
+
+    def _stream_answer(self, query: str, mode: str, limit: Optional[int], memory: Optional[ConversationMemory] = None):
+        """
+        Send generate_answer_stream events as Server-Sent Events.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.headers_sent = True
+
+        events = self.server.rag_system.generate_answer_stream(query, mode=mode, limit=limit, memory=memory)
+        for event in events:
+            self._send_event(event)
+        if memory is not None:
+            self._send_event({"type": "memory", "memory": memory.to_dict()})
+
+    def _send_event(self, event: dict):
+        data = json.dumps(event, ensure_ascii=False)
+        self.wfile.write(f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _read_json(self) -> Optional[dict]:
+        """
+        Read and parse the JSON request body, sending an error response on failure.
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._send_json(400, {"error": f"Request body must be JSON of at most {MAX_BODY_BYTES} bytes"})
+            return None
+
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            self._send_json(400, {"error": "Invalid JSON body"})
+            return None
+
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return None
+        return body
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.headers_sent = True
+        self.wfile.write(data)
+
+
+def _is_valid_memory(memory) -> bool:
+    """
+    Check that a request's memory matches the output of ConversationMemory.to_dict.
+    """
+    if not isinstance(memory, dict) or not isinstance(memory.get("summary", ""), (str, type(None))):
+        return False
+    turns = memory.get("turns", [])
+    return isinstance(turns, list) and all(
+        isinstance(turn, dict)
+        and isinstance(turn.get("question"), str)
+        and isinstance(turn.get("answer"), str)
+        for turn in turns
+    )
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    rag_system: Optional[LegalRAGSystem] = None,
+    max_concurrency: int = 4,
+    max_queue: int = 16,
+    queue_timeout: float = 30.0,
+    microbatch: bool = True
+) -> RAGServer:
+    """
+    Create the HTTP server, loading the RAG system and embedding model once.
+
+    Args:
+        host: Bind address
+        port: Bind port
+        rag_system: System to serve (default: a new LegalRAGSystem from env config)
+        max_concurrency: Maximum requests processed at the same time
+        max_queue: Maximum requests waiting for a slot
+        queue_timeout: Seconds a request may wait for a slot
+        microbatch: Batch concurrent query embeddings into shared model calls
+
+    Returns:
+        RAGServer instance (call serve_forever() to run it)
+    """
+    rag_system = rag_system or LegalRAGSystem()
+    rag_system.warmup()
+    if microbatch:
+        enable_embedding_batcher()
+    return RAGServer(
+        (host, port),
+        rag_system,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+        queue_timeout=queue_timeout
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP search/answer service for the legal RAG system")
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=os.getenv("RAG_SERVICE_HOST", "127.0.0.1"),
+        help="Bind address (default: from env RAG_SERVICE_HOST, else 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("RAG_SERVICE_PORT", "8000")),
+        help="Bind port (default: from env RAG_SERVICE_PORT, else 8000)"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=int(os.getenv("RAG_SERVICE_MAX_CONCURRENCY", "4")),
+        help="Maximum requests processed at the same time (default: 4)"
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=int(os.getenv("RAG_SERVICE_MAX_QUEUE", "16")),
+        help="Maximum requests waiting for a slot before returning 503 (default: 16)"
+    )
+    parser.add_argument(
+        "--no-microbatch",
+        action="store_true",
+        help="Embed each query separately instead of batching concurrent queries"
+    )
+    parser.add_argument(
+        "--queue-timeout",
+        type=float,
+        default=float(os.getenv("RAG_SERVICE_QUEUE_TIMEOUT", "30")),
+        help="Seconds a request may wait for a slot (default: 30)"
+    )
+
+    args = parser.parse_args()
+
+    server = create_server(
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        queue_timeout=args.queue_timeout,
+        microbatch=not args.no_microbatch
+    )
+    print(f"RAG service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -3,83 +3,591 @@
 Utility functions for RAG system
 """
 import os
+import atexit
+import hashlib
+import time
+import queue
+import threading
+from concurrent.futures import Future
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
+from .cache import LRUCache, SQLiteCache, normalize_text
+
 # Load environment variables
 load_dotenv()
 
 # Model configuration
 EMBEDDING_MODEL_NAME = "keepitreal/vietnamese-sbert"
 MODELS_DIR = Path(__file__).parent.parent / "models"
-MODELS_DIR.mkdir(exist_ok=True)
 
 # Global variable to store the model
 _embedding_model = None
+_embedding_model_lock = threading.Lock()
+
+# Query embedding cache, created on first use
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+# Background warmup thread, started once by warmup()
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+# Micro-batching scheduler for query embeddings, None when disabled
+_embedding_batcher = None
+_embedding_batcher_lock = threading.Lock()
+
+# tiktoken encoding for count_tokens, resolved on first use (False: unavailable)
+_token_encoding = None
+_token_encoding_lock = threading.Lock()
+
+# Shared MongoDB clients, keyed by (URL, options)
+_mongo_clients = {}
+_mongo_clients_lock = threading.Lock()
+
+
+def warmup(background=True):
+    """
+    Load the embedding model and run one dummy encode so the first real
+    query does not pay for model loading.
+    
+    Safe to call many times; the work runs only once per process.
+    
+    Args:
+        background: Run in a daemon thread and return immediately
+        
+    Returns:
+        The warmup thread (join() it to wait), or None when run in the foreground
+        
+    Raises:
+        Exception: If the model cannot be loaded (foreground only; the
+            background thread prints the error)
+    """
+    global _warmup_thread
+    
+    if not background:
+        get_embedding_model().encode("khởi động", normalize_embeddings=True)
+        return None
+    
+    def _run():
+        try:
+            get_embedding_model().encode("khởi động", normalize_embeddings=True)
+        except Exception as e:
+            print(f"Error warming up embedding model: {e}")
+    
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_run, name="embedding-warmup", daemon=True)
+            _warmup_thread.start()
+    
+    return _warmup_thread
+
+
+def get_local_model_path():
+    """
+    Directory where the embedding model is saved in models/.
+    """
+    return MODELS_DIR / EMBEDDING_MODEL_NAME.replace("/", "_")
+
+
+def load_torch_embedding_model():
+    """
+    Load the PyTorch SentenceTransformer model, downloading and saving it
+    to models/ folder if not exists.
+    """
+    # Imported here: sentence_transformers pulls in torch and transformers
+    from sentence_transformers import SentenceTransformer
+    
+    model_path = get_local_model_path()
+    
+    # Check if model exists locally
+    if model_path.exists() and any(model_path.iterdir()):
+        print(f"Loading embedding model from local: {model_path}")
+        return SentenceTransformer(str(model_path))
+    
+    print(f"Downloading embedding model: {EMBEDDING_MODEL_NAME}")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    # Save model to models/ folder
+    print(f"Saving model to: {model_path}")
+    MODELS_DIR.mkdir(exist_ok=True)
+    model.save(str(model_path))
+    print("Model saved successfully!")
+    return model
+
+
+def get_embedding_backend():
+    """
+    Embedding inference backend from env EMBEDDING_BACKEND:
+    "torch" (default), "onnx" or "onnx-int8".
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in ("torch", "onnx", "onnx-int8"):
+        raise ValueError(f"Invalid embedding backend: {backend}. Must be 'torch', 'onnx' or 'onnx-int8'")
+    return backend
 
 
 def get_embedding_model():
     """
     Load embedding model and save to models/ folder if not exists.
-    Returns the SentenceTransformer model.
+    Returns the SentenceTransformer model, or an ONNX Runtime encoder with the
+    same encode() interface when EMBEDDING_BACKEND is "onnx" or "onnx-int8".
     """
     global _embedding_model
     
     if _embedding_model is None:
-        model_path = MODELS_DIR / EMBEDDING_MODEL_NAME.replace("/", "_")
-        
-        # Check if model exists locally
-        if model_path.exists() and any(model_path.iterdir()):
-            print(f"Loading embedding model from local: {model_path}")
-            _embedding_model = SentenceTransformer(str(model_path))
-        else:
-            print(f"Downloading embedding model: {EMBEDDING_MODEL_NAME}")
-            _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-            # Save model to models/ folder
-            print(f"Saving model to: {model_path}")
-            _embedding_model.save(str(model_path))
-            print("Model saved successfully!")
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                backend = get_embedding_backend()
+                if backend == "torch":
+                    _embedding_model = load_torch_embedding_model()
+                else:
+                    from .onnx_encoder import load_onnx_encoder
+                    _embedding_model = load_onnx_encoder(quantized=backend == "onnx-int8")
     
     return _embedding_model
 
 
+class BatcherStoppedError(RuntimeError):
+    """
+    Raised for texts submitted to (or left in) a stopped EmbeddingBatcher.
+    """
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for query embeddings.
+    
+    Concurrent callers submit single texts; a worker thread collects them for
+    up to `max_wait_ms` (or until `max_batch_size` texts are waiting), runs one
+    batched model.encode and hands each caller its own vector.
+    """
+    
+    def __init__(self, max_batch_size=32, max_wait_ms=2.0):
+        """
+        Initialize scheduler and start its worker thread.
+        
+        Args:
+            max_batch_size: Maximum texts per model call
+            max_wait_ms: Maximum time the first text of a batch waits for others
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        # Makes the stopped check and the enqueue in submit() atomic with stop()
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+    
+    def submit(self, text):
+        """
+        Queue a text for embedding.
+        
+        Args:
+            text: Input text (non-empty)
+            
+        Returns:
+            concurrent.futures.Future resolving to a list of floats
+        """
+        future = Future()
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise BatcherStoppedError("Embedding batcher is stopped")
+            self._queue.put((text, future))
+        return future
+    
+    def encode(self, text, timeout=None):
+        """
+        Embed one text through the scheduler, blocking until its batch is done.
+        """
+        return self.submit(text).result(timeout=timeout)
+    
+    def stop(self):
+        """
+        Stop the worker thread after the queued texts are processed.
+        """
+        with self._submit_lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+            self._queue.put(None)
+        self._worker.join()
+        
+        # Nothing can be queued after the stop marker; fail anything left as a safeguard
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(BatcherStoppedError("Embedding batcher is stopped"))
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            # Collect more texts until the batch is full or the first one has waited long enough
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop_after_batch = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_after_batch = True
+                    break
+                batch.append(item)
+            
+            self._encode_batch(batch)
+            if stop_after_batch:
+                return
+    
+    def _encode_batch(self, batch):
+        # Skip texts whose callers cancelled their future
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for text, _ in batch]
+        futures = [future for _, future in batch]
+        
+        try:
+            vectors = get_embedding_model().encode(
+                texts,
+                batch_size=len(texts),
+                normalize_embeddings=True
+            )
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.items += len(texts)
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector.tolist())
+
+
+def enable_embedding_batcher(max_batch_size=None, max_wait_ms=None):
+    """
+    Route get_embedding model calls through a shared EmbeddingBatcher.
+    
+    Useful in multi-threaded servers where many queries are embedded at once.
+    Defaults come from env EMBEDDING_BATCH_MAX_SIZE (32) and EMBEDDING_BATCH_WAIT_MS (2).
+    
+    Returns:
+        EmbeddingBatcher instance
+    """
+    global _embedding_batcher
+    
+    with _embedding_batcher_lock:
+        if _embedding_batcher is None:
+            _embedding_batcher = EmbeddingBatcher(
+                max_batch_size=max_batch_size or int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+                max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "2"))
+            )
+    
+    return _embedding_batcher
+
+
+def disable_embedding_batcher():
+    """
+    Stop the shared EmbeddingBatcher; get_embedding calls the model directly again.
+    """
+    global _embedding_batcher
+    
+    with _embedding_batcher_lock:
+        batcher = _embedding_batcher
+        _embedding_batcher = None
+    
+    if batcher is not None:
+        batcher.stop()
+
+
+def _get_embedding_batcher():
+    """
+    Get the shared EmbeddingBatcher, enabling it first if env EMBEDDING_MICROBATCH=1.
+    """
+    if _embedding_batcher is None and os.getenv("EMBEDDING_MICROBATCH", "0") == "1":
+        return enable_embedding_batcher()
+    return _embedding_batcher
+
+
+def get_embedding_cache():
+    """
+    Get the query embedding cache, creating it on first use.
+    
+    Configured from environment variables:
+        EMBEDDING_CACHE_SIZE: Maximum in-memory entries (default: 1024, 0 disables caching)
+        EMBEDDING_CACHE_TTL: Entry lifetime in seconds (default: no expiry)
+        EMBEDDING_CACHE_PATH: SQLite file for a persistent tier (default: memory only)
+    
+    Returns:
+        LRUCache, or None if caching is disabled
+    """
+    global _embedding_cache
+    
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            maxsize = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+            if maxsize <= 0:
+                return None
+            ttl = float(os.getenv("EMBEDDING_CACHE_TTL")) if os.getenv("EMBEDDING_CACHE_TTL") else None
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+            backing = SQLiteCache(cache_path, table="query_embeddings", ttl=ttl) if cache_path else None
+            _embedding_cache = LRUCache(maxsize=maxsize, ttl=ttl, backing=backing)
+    
+    return _embedding_cache
+
+
+def get_embedding_cache_stats():
+    """
+    Get hit/miss statistics of the query embedding cache.
+    
+    Returns:
+        Dictionary with hits, misses, hit_rate, size and maxsize (empty if caching is disabled)
+    """
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
+
+
+def clear_embedding_cache():
+    """
+    Remove all cached query embeddings, including the persistent tier.
+    """
+    cache = get_embedding_cache()
+    if cache is not None:
+        cache.clear()
+
+
 def get_embedding(text):
     """
     Generate embedding for text using the Vietnamese SBERT model.
     
+    The text is normalized (NFC, collapsed whitespace) before encoding and
+    results are cached by that exact text, so a repeated query skips the
+    model forward pass. Casing is kept: the model is case-sensitive.
+    
     Args:
         text: Input text to embed
         
     Returns:
-        List of floats representing the embedding vector
+        List of floats representing the embedding vector (a new list the caller may modify)
     """
     if not text or not text.strip():
         print("Warning: Attempted to get embedding for empty text.")
         return None
     
+    text = normalize_text(text)
+    cache = get_embedding_cache()
+    key = f"{EMBEDDING_MODEL_NAME}:{get_embedding_backend()}:{text}"
+    if cache is not None:
+        embedding = cache.get(key)
+        if embedding is not None:
+            return list(embedding)
+    
+    batcher = _get_embedding_batcher()
+    embedding = None
+    if batcher is not None:
+        try:
+            embedding = batcher.encode(text)
+        except BatcherStoppedError:
+            # Batcher was disabled concurrently; embed directly
+            embedding = None
+    if embedding is None:
+        model = get_embedding_model()
+        embedding = model.encode(text, normalize_embeddings=True).tolist()
+    
+    if cache is not None:
+        cache.set(key, embedding)
+        return list(embedding)
+    return embedding
+
+
+def get_embeddings(texts, batch_size=32):
+    """
+    Generate embeddings for many texts with batched model calls.
+    
+    Texts are sorted by length before encoding so each model batch holds
+    texts of similar length and padding stays small. Results are returned
+    in the original order.
+    
+    Args:
+        texts: List of input texts
+        batch_size: Number of texts per model forward pass
+        
+    Returns:
+        List of embeddings (lists of floats), None for empty texts
+    """
+    embeddings = [None] * len(texts)
+    
+    # Skip empty texts, sort the rest by length (longest first)
+    indices = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not indices:
+        return embeddings
+    indices.sort(key=lambda i: len(texts[i]), reverse=True)
+    
     model = get_embedding_model()
-    embedding = model.encode(text, normalize_embeddings=True)
-    return embedding.tolist()
+    vectors = model.encode(
+        [texts[i] for i in indices],
+        batch_size=batch_size,
+        normalize_embeddings=True
+    )
+    
+    for i, vector in zip(indices, vectors):
+        embeddings[i] = vector.tolist()
+    
+    return embeddings
+
+
+def _load_token_encoding(tiktoken):
+    if os.getenv("TOKENIZER_ENCODING"):
+        return tiktoken.get_encoding(os.getenv("TOKENIZER_ENCODING"))
+    try:
+        return tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL_NAME") or "")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    """
+    Count LLM tokens in a text.
+    
+    Uses tiktoken when it is installed and its encoding can be loaded: env
+    TOKENIZER_ENCODING if set, else the encoding of the LLM (env
+    OPENAI_MODEL_NAME), else cl100k_base. Otherwise approximates with one
+    token per 3 characters, which slightly overestimates Vietnamese text.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Number of tokens
+    """
+    global _token_encoding
+    
+    if not text:
+        return 0
+    
+    with _token_encoding_lock:
+        if _token_encoding is None:
+            try:
+                import tiktoken
+                _token_encoding = _load_token_encoding(tiktoken)
+            except Exception as e:
+                print(f"Warning: tiktoken unavailable ({e.__class__.__name__}), approximating token counts.")
+                _token_encoding = False
+    
+    if _token_encoding is False:
+        return (len(text) + 2) // 3
+    return len(_token_encoding.encode(text, disallowed_special=()))
+
+
+def _get_int_env(name, default=None):
+    """
+    Read an integer setting from environment variables.
+    """
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
 
 
-def get_mongodb_connection():
+def get_mongodb_options():
     """
-    Get MongoDB connection from environment variables.
+    Get MongoClient options from environment variables.
+    
+    Returns:
+        Dictionary of pool size and timeout options
+    """
+    options = {
+        "maxPoolSize": _get_int_env("MONGODB_MAX_POOL_SIZE", 100),
+        "minPoolSize": _get_int_env("MONGODB_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _get_int_env("MONGODB_MAX_IDLE_TIME_MS"),
+        "serverSelectionTimeoutMS": _get_int_env("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000),
+        "connectTimeoutMS": _get_int_env("MONGODB_CONNECT_TIMEOUT_MS", 20000),
+        "socketTimeoutMS": _get_int_env("MONGODB_SOCKET_TIMEOUT_MS"),
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def get_mongodb_connection(mongo_url=None, **options):
+    """
+    Get a shared MongoDB client.
+    
+    Clients are created lazily and cached per (URL, options), so every caller
+    in the process reuses the same connection pool instead of paying for TLS
+    handshakes and SRV resolution again.
+    
+    Args:
+        mongo_url: MongoDB connection string (default from env: MONGODB_URL)
+        **options: MongoClient options, override the env defaults from get_mongodb_options()
     
     Returns:
         pymongo.MongoClient: MongoDB client
     """
     import pymongo
     
-    mongo_url = os.getenv("MONGODB_URL")
+    mongo_url = mongo_url or os.getenv("MONGODB_URL")
     if not mongo_url:
         raise ValueError(
             "MONGODB_URL not found in environment variables. "
             "Please set it in your .env file."
         )
     
-    return pymongo.MongoClient(mongo_url)
+    client_options = get_mongodb_options()
+    client_options.update(options)
+    key = (mongo_url, tuple(sorted(client_options.items())))
+    
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(key)
+        if client is None:
+            client = pymongo.MongoClient(mongo_url, **client_options)
+            _mongo_clients[key] = client
+    
+    return client
+
+
+def close_mongodb_connections():
+    """
+    Close all shared MongoDB clients.
+    
+    Registered with atexit; call it explicitly on worker shutdown or after
+    changing connection settings. The next get_mongodb_connection() call
+    creates a fresh client.
+    """
+    with _mongo_clients_lock:
+        clients = list(_mongo_clients.values())
+        _mongo_clients.clear()
+    
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            print(f"Error closing MongoDB client: {e}")
+
+
+atexit.register(close_mongodb_connections)
+
+
+def resolve_collection_names(db_name=None, collection_name=None):
+    """
+    Fill in the database and collection names from env
+    (MONGODB_DB_NAME, MONGODB_COLLECTION_NAME) when not given.
+    
+    Returns:
+        Tuple (db_name, collection_name)
+    """
+    return (
+        db_name or os.getenv("MONGODB_DB_NAME", "VNLawsDB"),
+        collection_name or os.getenv("MONGODB_COLLECTION_NAME", "VNLawsCollection"),
+    )
 
 
 def get_mongodb_collection(db_name=None, collection_name=None):
@@ -95,11 +603,35 @@ def get_mongodb_collection(db_name=None, collection_name=None):
     """
     client = get_mongodb_connection()
     
-    db_name = db_name or os.getenv("MONGODB_DB_NAME", "VNLawsDB")
-    collection_name = collection_name or os.getenv("MONGODB_COLLECTION_NAME", "VNLawsCollection")
+    db_name, collection_name = resolve_collection_names(db_name, collection_name)
     
     db = client[db_name]
     collection = db[collection_name]
     
     return collection
 
+
+
+def make_chunk_id(doc: dict) -> str:
+    """
+    Build a stable identifier for a corpus chunk.
+    
+    Uses the document's own `chunk_id` when present, otherwise hashes the
+    article's fields so the id survives re-ingestion. The content is part of
+    the hash: the corpus has different articles sharing a title, and only
+    exact duplicates may share an id.
+    
+    Args:
+        doc: Document with van_ban, loai_heading, tieu_de, noi_dung fields
+        
+    Returns:
+        Hex string identifier
+    """
+    if doc.get("chunk_id"):
+        return str(doc["chunk_id"])
+    
+    key = "\n".join(
+        str(doc.get(field, "")).strip()
+        for field in ("van_ban", "loai_heading", "tieu_de", "noi_dung")
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+In-process vector index for semantic search
+Keeps all corpus embeddings in one float32 matrix and searches it with NumPy
+"""
+import os
+import json
+from pathlib import Path
+from typing import List, Dict, Iterable, Union
+
+import numpy as np
+
+from .utils import EMBEDDING_MODEL_NAME, make_chunk_id
+from .chunking import CHUNK_FIELDS
+
+# Metadata fields returned with every search hit
+METADATA_FIELDS = ("van_ban", "tieu_de", "loai_heading", "noi_dung")
+
+# On-disk store layout
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+STORE_FORMAT_VERSION = 1
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine-similarity index over normalized embeddings.
+
+    Row i of `embeddings` belongs to `metadata[i]`, so a search is one
+    matrix-vector product followed by an argpartition top-k.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        metadata: List[Dict],
+        normalized: bool = False
+    ):
+        """
+        Initialize index.
+
+        Args:
+            embeddings: Matrix of shape (num_docs, dim)
+            metadata: One metadata dict per row of `embeddings`
+            normalized: If True, `embeddings` is already a C-contiguous float32
+                matrix with unit-length rows and is used as-is (no copy), which
+                keeps memory-mapped stores shared between processes
+        """
+        if embeddings.ndim != 2:
+            raise ValueError(f"Embeddings must be a 2-D matrix, got shape {embeddings.shape}")
+        if len(metadata) != embeddings.shape[0]:
+            raise ValueError(
+                f"Metadata size ({len(metadata)}) does not match "
+                f"number of embeddings ({embeddings.shape[0]})"
+            )
+
+        if normalized:
+            if embeddings.dtype != np.float32 or not embeddings.flags["C_CONTIGUOUS"]:
+                raise ValueError("Normalized embeddings must be a C-contiguous float32 matrix")
+            self.embeddings = embeddings
+        else:
+            self.embeddings = _normalize_rows(embeddings)
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        return self.embeddings.shape[1]
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict]) -> "LocalVectorIndex":
+        """
+        Build index from documents that carry an `embedding` field.
+
+        Args:
+            documents: Iterable of documents (e.g. a MongoDB cursor)
+
+        Returns:
+            LocalVectorIndex instance
+        """
+        vectors = []
+        metadata = []
+        for doc in documents:
+            embedding = doc.get("embedding")
+            if not embedding:
+                continue
+            vectors.append(embedding)
+            record = {"id": make_chunk_id(doc)}
+            record.update({field: doc.get(field, "") for field in METADATA_FIELDS})
+            record.update({field: doc[field] for field in CHUNK_FIELDS if doc.get(field)})
+            metadata.append(record)
+
+        if not vectors:
+            raise ValueError("No documents with embeddings found to build the local vector index.")
+
+        return cls(np.asarray(vectors, dtype=np.float32), metadata)
+
+    @classmethod
+    def from_collection(cls, collection) -> "LocalVectorIndex":
+        """
+        Build index with a single scan over a MongoDB collection.
+
+        Args:
+            collection: pymongo collection with an `embedding` field
+
+        Returns:
+            LocalVectorIndex instance
+        """
+        projection = {"_id": 0, "embedding": 1, "chunk_id": 1}
+        projection.update({field: 1 for field in METADATA_FIELDS + CHUNK_FIELDS})
+        cursor = collection.find({"embedding": {"$exists": True}}, projection)
+        return cls.from_documents(cursor)
+
+    @classmethod
+    def load(cls, store_dir: Union[str, Path], mmap: bool = True) -> "LocalVectorIndex":
+        """
+        Load index from an on-disk store written by `save`.
+
+        With `mmap=True` the embedding matrix is opened with numpy.memmap, so
+        processes loading the same store share one page-cached copy.
+
+        Args:
+            store_dir: Store directory
+            mmap: Memory-map the embedding file instead of reading it into RAM
+
+        Returns:
+            LocalVectorIndex instance
+        """
+        store_dir = Path(store_dir)
+        with open(store_dir / METADATA_FILE, "r", encoding="utf-8") as f:
+            header = json.load(f)
+
+        version = header.get("format_version")
+        if version != STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported vector store format version {version} in {store_dir}, "
+                f"expected {STORE_FORMAT_VERSION}"
+            )
+
+        if header.get("model") != EMBEDDING_MODEL_NAME:
+            print(
+                f"Warning: Vector store {store_dir} was built with model {header.get('model')}, "
+                f"current embedding model is {EMBEDDING_MODEL_NAME}"
+            )
+
+        embeddings = np.load(store_dir / EMBEDDINGS_FILE, mmap_mode="r" if mmap else None)
+        if embeddings.shape != (header["count"], header["dimension"]):
+            raise ValueError(
+                f"Vector store {store_dir} is inconsistent: embeddings have shape "
+                f"{embeddings.shape}, metadata expects ({header['count']}, {header['dimension']})"
+            )
+
+        return cls(embeddings, header["documents"], normalized=True)
+
+    def save(self, store_dir: Union[str, Path]):
+        """
+        Write index to an on-disk store.
+
+        The store holds `embeddings.npy` (float32, one normalized row per chunk)
+        and `metadata.json` (chunk ids and metadata, in row order). Files are
+        written to temporary paths first and then renamed, so readers never see
+        a half-written store.
+
+        Args:
+            store_dir: Store directory (created if missing)
+        """
+        store_dir = Path(store_dir)
+        store_dir.mkdir(parents=True, exist_ok=True)
+
+        header = {
+            "format_version": STORE_FORMAT_VERSION,
+            "model": EMBEDDING_MODEL_NAME,
+            "count": len(self),
+            "dimension": self.dimension,
+            "documents": self.metadata,
+        }
+
+        embeddings_tmp = store_dir / (EMBEDDINGS_FILE + ".tmp")
+        metadata_tmp = store_dir / (METADATA_FILE + ".tmp")
+        with open(embeddings_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        with open(metadata_tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+
+        os.replace(embeddings_tmp, store_dir / EMBEDDINGS_FILE)
+        os.replace(metadata_tmp, store_dir / METADATA_FILE)
+
+    def search(self, query_embedding, limit: int) -> List[Dict]:
+        """
+        Find the `limit` documents closest to the query embedding.
+
+        Scores use the same scale as Atlas `vectorSearchScore` for cosine
+        similarity, i.e. (1 + cosine) / 2.
+
+        Args:
+            query_embedding: Query vector (list or array of length `dimension`)
+            limit: Maximum number of results
+
+        Returns:
+            List of metadata dicts with an added `score` field, best first
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape != (self.dimension,):
+            raise ValueError(
+                f"Query embedding dimension {query.shape} does not match index dimension {self.dimension}"
+            )
+
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        limit = min(limit, len(self))
+        if limit <= 0:
+            return []
+
+        scores = self.embeddings @ query
+        if limit < len(scores):
+            top = np.argpartition(scores, -limit)[-limit:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+
+        results = []
+        for idx in top:
+            result = dict(self.metadata[idx])
+            result["score"] = float((1.0 + scores[idx]) / 2.0)
+            results.append(result)
+
+        return results
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Return a C-contiguous float32 copy of `matrix` with unit-length rows.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
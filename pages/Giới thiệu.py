@@ -1,19 +1,9 @@
 import streamlit as st
-import base64 
-from PIL import Image
-import sys
-import os
-from pathlib import Path
 
-#Gioi thieu
-@st.cache_data
-def get_base64_of_bin_file(bin_file: str) -> str:
-		with open(bin_file, 'rb') as f:
-				data = f.read()
-		return base64.b64encode(data).decode()
+from libs.assets import get_static_image_url
 
-BG_PATH = Path(r"D:\UIT\AI\LegiSearch\Source\LawAI.jpg")
-bg_b64 = get_base64_of_bin_file(BG_PATH)
+# Background image (display-size WebP served from static/, see libs/assets.py)
+bg_url = get_static_image_url("LawAI.jpg", 1920)
 # Page configuration
 st.set_page_config(page_title="Portfolio", layout="wide")
 # HTML/CSS: hero layout with left text and right visual (image as background)
@@ -101,7 +91,7 @@ AI tư vấn bảo hiểm xã hội Việt Nam là hệ thống trợ lý thông
 st.markdown(f"""
 <style>
     .stMain {{
-        background-image: url("data:image/jpg;base64,{bg_b64}");
+        background-image: url("{bg_url}");
         background-size: cover;
         background-position: center center;
         background-repeat: no-repeat;
@@ -184,32 +174,32 @@ members = [
     {
         "name": "Ngô Phạm Thế Duy",
         "student_id": "25210013",
-        "image_path": "Source\\Duy.jpg"
+        "image": "Duy.jpg"
     },
     {
         "name": "Đào Phước Thịnh",
         "student_id": "25210038",
-        "image_path": "Source\\DaoPhuocThinh.jpg"
+        "image": "DaoPhuocThinh.jpg"
     },
     {
         "name": "Trần Thị Tố Linh",
         "student_id": "25210018",
-        "image_path": "Source\\TranThiToLinh.jpg"
+        "image": "TranThiToLinh.jpg"
     },
     {
         "name": "Lê Văn Mạnh",
         "student_id": "25210020",
-        "image_path": "Source\\LeVanManh.jpg"
+        "image": "LeVanManh.jpg"
     },
     {
         "name": "Hoàng Tùng",
         "student_id": "25210049",
-        "image_path": "Source\\Tung.jpg"
+        "image": "Tung.jpg"
     },
     {
         "name": "Trần Xuân Hòa",
         "student_id": "25210016",
-        "image_path": "Source\\Hoa.jpg"
+        "image": "Hoa.jpg"
     }
 ]
 
@@ -221,21 +211,9 @@ for i, member in enumerate(members):
     with col1:
         # Try to load image, if not found use a placeholder
         try:
-            img_path = Path(f"D:\\UIT\\AI\\LegiSearch\\{member['image_path']}")
-            if img_path.exists():
-                st.image(str(img_path), use_container_width=True)
-            else:
-                # Placeholder if image doesn't exist
-                st.markdown(f"""
-                <div style="width: 150px; height: 150px; border-radius: 50%; 
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                display: flex; align-items: center; justify-content: center; 
-                color: white; font-size: 3rem; font-weight: bold; margin: auto;">
-                    {member['name'][0]}
-                </div>
-                """, unsafe_allow_html=True)
-        except:
-            # Fallback placeholder
+            img_url = get_static_image_url(member["image"], 300)
+            st.markdown(f'<img src="{img_url}" class="member-image" />', unsafe_allow_html=True)
+        except Exception:
             st.markdown(f"""
             <div style="width: 150px; height: 150px; border-radius: 50%; 
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
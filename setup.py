@@ -4,4 +4,8 @@ setup(
     name="legisearch",
     version="0.1.0",
     packages=find_packages(),  # this will automatically include 'libs'
+    extras_require={
+        # ONNX Runtime embedding backend (EMBEDDING_BACKEND=onnx / onnx-int8)
+        "onnx": ["onnx>=1.14.0", "onnxruntime>=1.16.0"],
+    },
 )
\ No newline at end of file
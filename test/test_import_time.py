@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra thời gian import của package libs
+Import libs (và các CLI như create_embeddings) không được tải model hay LLM.
+Chạy: python -m pytest test/test_import_time.py
+"""
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Thời gian import tối đa (giây)
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.0"))
+
+# Các thư viện nặng chỉ được tải khi thật sự dùng model/LLM
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "langchain_openai",
+    "langchain_core",
+    "onnxruntime",
+]
+
+IMPORT_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+import libs
+import libs.utils
+import libs.search
+import libs.create_embeddings
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _run_import():
+    """Import libs trong một process mới, trả về thời gian và danh sách module đã tải"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_time_budget():
+    """Import libs phải nhanh hơn IMPORT_TIME_BUDGET"""
+    result = _run_import()
+    assert result["elapsed"] < IMPORT_TIME_BUDGET, (
+        f"Import libs mất {result['elapsed']:.3f}s, vượt ngân sách {IMPORT_TIME_BUDGET}s"
+    )
+
+
+def test_no_heavy_imports():
+    """Import libs không được tải torch, sentence_transformers, langchain..."""
+    modules = set(_run_import()["modules"])
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    assert not loaded, f"Import libs đã tải các thư viện nặng: {loaded}"
+
+
+if __name__ == "__main__":
+    result = _run_import()
+    print(f"Thời gian import: {result['elapsed']:.3f}s (ngân sách: {IMPORT_TIME_BUDGET}s)")
+    loaded = [name for name in HEAVY_MODULES if name in set(result["modules"])]
+    print(f"Thư viện nặng đã tải: {loaded or 'không có'}")